@@ -1,66 +1,70 @@
 #!/usr/bin/env python3
 """Check coverage for all pairwise ISO fixed XML files."""
 
-import subprocess
-import re
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "exsisting_code"))
+import xsd_coverage as xc
+
 xsd_file = "test/ISO/IEC62474_Schema_X8.21-120240831.xsd"
 xml_dir = Path("generated/pairwise_iso_fixed")
 
-results = []
-
-for xml_file in sorted(xml_dir.glob("pairwise_test_*.xml")):
-    # Run coverage check
-    result = subprocess.run(
-        ["python", "exsisting_code/xsd_coverage.py", xsd_file, str(xml_file)],
-        capture_output=True,
-        text=True
-    )
+# Per-worker checker; the XSD is analyzed once per process, not once per file
+checker = None
 
-    output = result.stdout + result.stderr
 
-    # Extract coverage percentage
-    coverage_match = re.search(r'カバレッジ率:\s+(\d+\.\d+)%', output.split('【総合カバレッジ】')[-1])
-    coverage = coverage_match.group(1) if coverage_match else "0.00"
+def init_worker(xsd_path: str):
+    """Analyze the XSD once when a worker process starts."""
+    global checker
+    checker = xc.CoverageChecker(xsd_path)
 
-    # Count undefined elements and attributes
-    undefined_elem = output.count("XSDで未定義:")
 
-    # Check for truly undefined (not external schema)
-    truly_undefined = 0
-    if "【警告: XSDで定義されていない要素パス】" in output:
-        truly_undefined_section = output.split("【警告: XSDで定義されていない要素パス】")[1]
-        truly_undefined = truly_undefined_section.count("⚠️")
+def run_one(xml_file: Path) -> dict:
+    """Run the coverage check for one XML file."""
+    report = checker.check(str(xml_file))
 
-    results.append({
+    return {
         'file': xml_file.name,
-        'coverage': float(coverage),
-        'undefined_count': undefined_elem,
-        'truly_undefined': truly_undefined
-    })
-
-# Print results
-print("=" * 80)
-print("Pairwise ISO Fixed XML Coverage Summary")
-print("=" * 80)
-print(f"{'File':<30} {'Coverage':>10} {'Undefined':>12} {'Truly Undefined':>18}")
-print("-" * 80)
-
-for r in results:
-    print(f"{r['file']:<30} {r['coverage']:>9.2f}% {r['undefined_count']:>12} {r['truly_undefined']:>18}")
-
-# Summary statistics
-print("-" * 80)
-zero_coverage = [r for r in results if r['coverage'] == 0]
-with_undefined = [r for r in results if r['truly_undefined'] > 0]
-
-print(f"\nSummary:")
-print(f"  Total files: {len(results)}")
-print(f"  Files with 0% coverage: {len(zero_coverage)}")
-if zero_coverage:
-    print(f"    {', '.join([r['file'] for r in zero_coverage])}")
-print(f"  Files with truly undefined elements: {len(with_undefined)}")
-if with_undefined:
-    for r in with_undefined:
-        print(f"    {r['file']}: {r['truly_undefined']} undefined")
+        'coverage': report.coverage,
+        'undefined_count': report.undefined_count,
+        'truly_undefined': report.truly_undefined
+    }
+
+
+if __name__ == "__main__":
+    xml_files = sorted(xml_dir.glob("pairwise_test_*.xml"))
+
+    # Each file is checked independently, so run them in parallel.
+    # map() yields results in input order.
+    with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                             initializer=init_worker,
+                             initargs=(xsd_file,)) as ex:
+        results = list(ex.map(run_one, xml_files, chunksize=4))
+
+    # Print results
+    print("=" * 80)
+    print("Pairwise ISO Fixed XML Coverage Summary")
+    print("=" * 80)
+    print(f"{'File':<30} {'Coverage':>10} {'Undefined':>12} {'Truly Undefined':>18}")
+    print("-" * 80)
+
+    for r in results:
+        print(f"{r['file']:<30} {r['coverage']:>9.2f}% {r['undefined_count']:>12} {r['truly_undefined']:>18}")
+
+    # Summary statistics
+    print("-" * 80)
+    zero_coverage = [r for r in results if r['coverage'] == 0]
+    with_undefined = [r for r in results if r['truly_undefined'] > 0]
+
+    print(f"\nSummary:")
+    print(f"  Total files: {len(results)}")
+    print(f"  Files with 0% coverage: {len(zero_coverage)}")
+    if zero_coverage:
+        print(f"    {', '.join([r['file'] for r in zero_coverage])}")
+    print(f"  Files with truly undefined elements: {len(with_undefined)}")
+    if with_undefined:
+        for r in with_undefined:
+            print(f"    {r['file']}: {r['truly_undefined']} undefined")
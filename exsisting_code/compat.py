@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Pythonのバージョン差を吸収する共通ヘルパー
+
+複数のモジュールで使うものをここに置き、公開名で import する。
+"""
+
+import sys
+
+
+# パターンなどのデータクラスは __slots__ 付きにする
+# （インスタンスごとの __dict__ を持たない。dataclass の slots 引数は Python 3.10 以降）
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+try:
+    # ビット集合の要素数（Python 3.10以降）
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(bits: int) -> int:
+        """ビット集合の要素数"""
+        return bin(bits).count('1')
@@ -11,11 +11,19 @@ from typing import List, Optional, Set, Dict, Tuple
 from lxml import etree
 
 
-@dataclass
+# XML Schemaの名前空間（Clark記法のタグ名 f'{XS}element' などで使う）
+XS_NAMESPACE = 'http://www.w3.org/2001/XMLSchema'
+XS = f'{{{XS_NAMESPACE}}}'
+
+
+@dataclass(eq=False)
 class OptionalItem:
     """
     オプション項目の定義
 
+    比較・ハッシュはオブジェクトの同一性で行う。
+    パスで比較する場合は path を直接比較する。
+
     Attributes:
         path: パス（例: "/Item/Description" or "/Item@status"）
         item_type: "element" または "attribute"
@@ -39,14 +47,6 @@ class OptionalItem:
     choice_group_id: Optional[int] = None
     choice_options: List[str] = field(default_factory=list)
 
-    def __hash__(self):
-        return hash(self.path)
-
-    def __eq__(self, other):
-        if not isinstance(other, OptionalItem):
-            return False
-        return self.path == other.path
-
 
 class OptionalElementExtractor:
     """
@@ -59,18 +59,68 @@ class OptionalElementExtractor:
     4. maxOccurs="unbounded"の要素（0個/1個/複数個のバリエーション）
     """
 
+    # priority_mapに指定がない場合の優先度
+    DEFAULT_ELEMENT_PRIORITY = 5
+    DEFAULT_CHOICE_PRIORITY = 7  # choiceは重要度高め
+    DEFAULT_ATTRIBUTE_PRIORITY = 4  # 属性は要素より優先度低め
+
     def __init__(self, xsd_path: str):
         """
         Args:
             xsd_path: XSDファイルのパス
         """
         self.xsd_path = xsd_path
-        self.schema_tree = etree.parse(xsd_path)
-        self.ns = {'xs': 'http://www.w3.org/2001/XMLSchema'}
+        self.ns = {'xs': XS_NAMESPACE}
+
+        # 名前→定義のインデックス（文書順で最初の定義を優先）
+        # 再帰のたびに // のXPathで全体を走査しないよう、一度だけ構築する
+        self._elements_by_name: Dict[str, etree.Element] = {}
+        self._complex_by_name: Dict[str, etree.Element] = {}
+        self._simple_by_name: Dict[str, etree.Element] = {}
+        self._root_element: Optional[etree.Element] = None
+
+        # パースと同時に1パスでインデックスを構築
+        # startイベントは文書順に届くので、setdefaultで最初の定義が残る
+        name_indexes = {
+            f'{XS}element': self._elements_by_name,
+            f'{XS}complexType': self._complex_by_name,
+            f'{XS}simpleType': self._simple_by_name,
+        }
+        # XSDにはDTD・実体参照・ID属性が不要なので、それらの処理を省いてパースする
+        context = etree.iterparse(
+            xsd_path,
+            events=('start',),
+            tag=tuple(name_indexes),
+            remove_blank_text=True,
+            remove_comments=True,
+            resolve_entities=False,
+            load_dtd=False,
+            no_network=True,
+            collect_ids=False,
+            huge_tree=True
+        )
+        for _, definition in context:
+            name = definition.get('name')
+            if name is not None:
+                name_indexes[definition.tag].setdefault(name, definition)
+
+            # トップレベルの最初のxs:elementをルート要素とする
+            if self._root_element is None and definition.tag == f'{XS}element':
+                parent = definition.getparent()
+                if parent is not None and parent.getparent() is None and parent.tag == f'{XS}schema':
+                    self._root_element = definition
+
+        self.schema_tree = etree.ElementTree(context.root)
 
         # 抽出結果
         self.optional_items: List[OptionalItem] = []
         self.choice_group_counter = 0
+        # get_choice_groups()の結果（extract()のたびに作り直す）
+        self._choice_groups_cache: Optional[Dict[int, Tuple[str, ...]]] = None
+
+        # 要素展開結果のキャッシュ
+        # {(要素名, 残り深度): (相対パスの項目リスト, 消費したchoiceグループ数)}
+        self._expansion_cache: Dict[Tuple[str, int], Tuple[List[Tuple], int]] = {}
 
     def extract(
         self,
@@ -91,9 +141,11 @@ class OptionalElementExtractor:
         """
         self.optional_items = []
         self.choice_group_counter = 0
+        self._choice_groups_cache = None
         self.priority_map = priority_map or {}
         self.max_depth = max_depth
         self.include_unbounded = include_unbounded
+        self._expansion_cache = {}
 
         # ルート要素を特定
         root_element = self._find_root_element()
@@ -113,12 +165,8 @@ class OptionalElementExtractor:
 
     def _find_root_element(self) -> Optional[etree.Element]:
         """ルート要素を特定"""
-        # xs:elementでトップレベルのものを探す
-        elements = self.schema_tree.xpath(
-            '/xs:schema/xs:element',
-            namespaces=self.ns
-        )
-        return elements[0] if elements else None
+        # xs:schema直下の最初のxs:element（解析時に記録済み）
+        return self._root_element
 
     def _extract_from_element(
         self,
@@ -137,6 +185,36 @@ class OptionalElementExtractor:
         if current_depth > self.max_depth:
             return
 
+        # 要素の定義は名前だけで決まるので、その下の展開結果は
+        # (要素名, 残り深度) が同じなら親に依らず同一になる。
+        # 2回目以降はキャッシュした相対パスの項目を current_path の下に複製する
+        cache_key = (elem_name, self.max_depth - current_depth)
+        cached = self._expansion_cache.get(cache_key)
+        if cached is not None:
+            relative_items, group_count = cached
+            self._splice_cached_items(relative_items, current_path)
+            self.choice_group_counter += group_count
+            return
+
+        first_item = len(self.optional_items)
+        first_group_id = self.choice_group_counter
+        self._expand_element(elem_name, current_path, current_depth)
+        self._expansion_cache[cache_key] = (
+            self._to_relative_items(
+                self.optional_items[first_item:],
+                current_path,
+                first_group_id
+            ),
+            self.choice_group_counter - first_group_id
+        )
+
+    def _expand_element(
+        self,
+        elem_name: str,
+        current_path: str,
+        current_depth: int
+    ):
+        """要素の型定義を辿ってオプション項目を抽出（キャッシュなし）"""
         # 要素定義を取得
         elem_def = self._find_element_definition(elem_name)
         if elem_def is None:
@@ -146,7 +224,7 @@ class OptionalElementExtractor:
         type_name = elem_def.get('type')
         if type_name is None:
             # インライン型定義
-            type_def = elem_def.find('xs:complexType', namespaces=self.ns)
+            type_def = elem_def.find(f'{XS}complexType')
             if type_def is not None:
                 self._extract_from_complex_type(
                     type_def,
@@ -163,6 +241,59 @@ class OptionalElementExtractor:
                     current_depth
                 )
 
+    def _to_relative_items(
+        self,
+        items: List[OptionalItem],
+        base_path: str,
+        first_group_id: int
+    ) -> List[Tuple]:
+        """項目のパスとchoiceグループIDを展開の起点からの相対値に変換"""
+        prefix_len = len(base_path)
+        relative_items = []
+        for item in items:
+            group_offset = None
+            if item.choice_group_id is not None:
+                group_offset = item.choice_group_id - first_group_id
+            relative_items.append((
+                item.path[prefix_len:],
+                item.item_type,
+                item.min_occurs,
+                item.max_occurs,
+                item.is_choice,
+                group_offset,
+                [option[prefix_len:] for option in item.choice_options]
+            ))
+        return relative_items
+
+    def _splice_cached_items(self, relative_items: List[Tuple], base_path: str):
+        """キャッシュした相対項目を base_path の下の項目として追加"""
+        first_group_id = self.choice_group_counter
+
+        for (relative_path, item_type, min_occurs, max_occurs,
+                is_choice, group_offset, relative_options) in relative_items:
+            path = base_path + relative_path
+            if is_choice:
+                default_priority = self.DEFAULT_CHOICE_PRIORITY
+            elif item_type == "element":
+                default_priority = self.DEFAULT_ELEMENT_PRIORITY
+            else:
+                default_priority = self.DEFAULT_ATTRIBUTE_PRIORITY
+
+            choice_group_id = None
+            if group_offset is not None:
+                choice_group_id = first_group_id + group_offset
+
+            self.optional_items.append(OptionalItem(
+                path=path,
+                item_type=item_type,
+                priority=self.priority_map.get(path, default_priority),
+                min_occurs=min_occurs,
+                max_occurs=max_occurs,
+                is_choice=is_choice,
+                choice_group_id=choice_group_id,
+                choice_options=[base_path + option for option in relative_options]
+            ))
+
     def _extract_from_complex_type(
         self,
         type_def: etree.Element,
@@ -176,18 +307,18 @@ class OptionalElementExtractor:
         self._extract_optional_attributes(type_def, parent_path)
 
         # 子要素を抽出
-        # sequence要素を探す
-        sequence = type_def.find('.//xs:sequence', namespaces=self.ns)
+        # 直接の子のsequence/choiceのみを見る（.//だと子要素のインライン型や
+        # extension内のsequenceまで拾い、二重に抽出してしまう）
+        sequence = type_def.find(f'{XS}sequence')
         if sequence is not None:
             self._extract_from_sequence(sequence, parent_path, current_depth)
 
-        # choice要素を探す
-        choice = type_def.find('.//xs:choice', namespaces=self.ns)
+        choice = type_def.find(f'{XS}choice')
         if choice is not None:
             self._extract_from_choice(choice, parent_path, current_depth)
 
-        # complexContent/extensionの場合
-        extension = type_def.find('.//xs:extension', namespaces=self.ns)
+        # complexContent/simpleContentのextensionの場合
+        extension = self._find_extension(type_def)
         if extension is not None:
             # 基底型の処理
             base_type = extension.get('base')
@@ -201,22 +332,38 @@ class OptionalElementExtractor:
                     )
 
             # extensionの中のsequence/choice
-            seq = extension.find('xs:sequence', namespaces=self.ns)
+            seq = extension.find(f'{XS}sequence')
             if seq is not None:
                 self._extract_from_sequence(seq, parent_path, current_depth)
 
-            ch = extension.find('xs:choice', namespaces=self.ns)
+            ch = extension.find(f'{XS}choice')
             if ch is not None:
                 self._extract_from_choice(ch, parent_path, current_depth)
 
+    def _find_extension(self, type_def: etree.Element) -> Optional[etree.Element]:
+        """complexContent/simpleContent直下のextensionを取得"""
+        extension = type_def.find(f'{XS}complexContent/{XS}extension')
+        if extension is None:
+            extension = type_def.find(f'{XS}simpleContent/{XS}extension')
+        return extension
+
     def _extract_from_sequence(
         self,
         sequence: etree.Element,
         parent_path: str,
         current_depth: int
     ):
-        """sequenceから要素を抽出"""
-        for child_elem in sequence.findall('xs:element', namespaces=self.ns):
+        """sequenceから要素を抽出（入れ子のsequence/choiceも文書順に処理する）"""
+        for child_elem in sequence:
+            if child_elem.tag == f'{XS}sequence':
+                self._extract_from_sequence(child_elem, parent_path, current_depth)
+                continue
+            if child_elem.tag == f'{XS}choice':
+                self._extract_from_choice(child_elem, parent_path, current_depth)
+                continue
+            if child_elem.tag != f'{XS}element':
+                continue
+
             elem_name = child_elem.get('name') or child_elem.get('ref')
             if elem_name is None:
                 continue
@@ -229,7 +376,7 @@ class OptionalElementExtractor:
 
             # minOccurs="0"ならオプション
             if min_occurs == 0:
-                priority = self.priority_map.get(child_path, 5)
+                priority = self.priority_map.get(child_path, self.DEFAULT_ELEMENT_PRIORITY)
                 item = OptionalItem(
                     path=child_path,
                     item_type="element",
@@ -264,14 +411,24 @@ class OptionalElementExtractor:
         choiceからオプション項目を抽出
 
         choice要素の各選択肢は互いに排他的なので、
-        それぞれを個別のオプション項目として扱う
+        それぞれを個別のオプション項目として扱う。
+        入れ子のsequence/choiceの中の要素宣言も、文書順に同じグループの選択肢とする
         """
         choice_group_id = self.choice_group_counter
         self.choice_group_counter += 1
 
         choice_paths = []
 
-        for child_elem in choice.findall('xs:element', namespaces=self.ns):
+        nodes = list(choice)
+        nodes.reverse()
+        while nodes:
+            child_elem = nodes.pop()
+            if child_elem.tag in (f'{XS}sequence', f'{XS}choice'):
+                nodes.extend(reversed(child_elem))
+                continue
+            if child_elem.tag != f'{XS}element':
+                continue
+
             elem_name = child_elem.get('name') or child_elem.get('ref')
             if elem_name is None:
                 continue
@@ -282,7 +439,7 @@ class OptionalElementExtractor:
         # 各選択肢をオプション項目として追加
         for child_path in choice_paths:
             elem_name = child_path.rsplit('/', 1)[-1]
-            priority = self.priority_map.get(child_path, 7)  # choiceは重要度高め
+            priority = self.priority_map.get(child_path, self.DEFAULT_CHOICE_PRIORITY)
 
             item = OptionalItem(
                 path=child_path,
@@ -308,8 +465,17 @@ class OptionalElementExtractor:
         type_def: etree.Element,
         element_path: str
     ):
-        """use="optional"の属性を抽出"""
-        for attr in type_def.findall('.//xs:attribute', namespaces=self.ns):
+        """use="optional"の属性を抽出
+
+        対象は型直下の属性とextension直下の属性のみ。基底型の属性は
+        _extract_from_complex_typeが基底型を辿る際に抽出される。
+        """
+        attrs = type_def.findall(f'{XS}attribute')
+        extension = self._find_extension(type_def)
+        if extension is not None:
+            attrs += extension.findall(f'{XS}attribute')
+
+        for attr in attrs:
             attr_name = attr.get('name')
             if attr_name is None:
                 continue
@@ -318,7 +484,7 @@ class OptionalElementExtractor:
 
             if attr_use == 'optional':
                 attr_path = f"{element_path}@{attr_name}"
-                priority = self.priority_map.get(attr_path, 4)  # 属性は要素より優先度低め
+                priority = self.priority_map.get(attr_path, self.DEFAULT_ATTRIBUTE_PRIORITY)
 
                 item = OptionalItem(
                     path=attr_path,
@@ -329,47 +495,37 @@ class OptionalElementExtractor:
 
     def _find_element_definition(self, elem_name: str) -> Optional[etree.Element]:
         """要素定義を検索"""
-        # グローバル要素定義
-        elems = self.schema_tree.xpath(
-            f'//xs:element[@name="{elem_name}"]',
-            namespaces=self.ns
-        )
-        return elems[0] if elems else None
+        return self._elements_by_name.get(elem_name)
 
     def _find_type_definition(self, type_name: str) -> Optional[etree.Element]:
         """型定義を検索"""
         # 名前空間プレフィックスを除去
         local_name = type_name.split(':')[-1]
 
-        # complexType
-        types = self.schema_tree.xpath(
-            f'//xs:complexType[@name="{local_name}"]',
-            namespaces=self.ns
-        )
-        if types:
-            return types[0]
+        # complexTypeを優先し、なければsimpleType
+        type_def = self._complex_by_name.get(local_name)
+        if type_def is None:
+            type_def = self._simple_by_name.get(local_name)
+        return type_def
 
-        # simpleType
-        types = self.schema_tree.xpath(
-            f'//xs:simpleType[@name="{local_name}"]',
-            namespaces=self.ns
-        )
-        return types[0] if types else None
-
-    def get_choice_groups(self) -> Dict[int, List[str]]:
+    def get_choice_groups(self) -> Dict[int, Tuple[str, ...]]:
         """
         Choice グループのマッピングを取得
 
+        抽出結果から一度だけ構築し、次のextract()まで同じ結果を返す。
+
         Returns:
-            {group_id: [path1, path2, ...]}
+            {group_id: (path1, path2, ...)}
         """
-        groups = {}
-        for item in self.optional_items:
-            if item.is_choice:
-                if item.choice_group_id not in groups:
-                    groups[item.choice_group_id] = []
-                groups[item.choice_group_id].append(item.path)
-        return groups
+        if self._choice_groups_cache is None:
+            groups: Dict[int, List[str]] = {}
+            for item in self.optional_items:
+                if item.is_choice:
+                    groups.setdefault(item.choice_group_id, []).append(item.path)
+            self._choice_groups_cache = {
+                group_id: tuple(paths) for group_id, paths in groups.items()
+            }
+        return self._choice_groups_cache
 
     def get_optional_elements(self) -> List[OptionalItem]:
         """オプション要素のみを取得"""
@@ -6,13 +6,217 @@
 カバーする最小のテストパターンを生成する。
 """
 
-from dataclasses import dataclass, field
-from typing import List, Dict, Set, Tuple, Optional
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Iterable, Tuple
 from itertools import combinations
 import random
 
+from compat import DATACLASS_SLOTS, popcount
 
-@dataclass
+
+# True/False（バイト値1/0）を2進数の文字に変換する表
+_BINARY_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+# バイト値のビットs（0〜7）を2進数の文字に変換する表（列の取り出し用）
+_BIT_DIGITS = [
+    bytes(0x31 if value >> shift & 1 else 0x30 for value in range(256))
+    for shift in range(8)
+]
+
+
+def pack_values(values: List[bool]) -> int:
+    """
+    割り当てを整数に（パラメータiはビットi）
+
+    バイト列の変換と int() で行い、パラメータごとのPythonループを避ける
+    """
+    if not values:
+        return 0
+    return int(bytes(reversed(values)).translate(_BINARY_DIGITS), 2)
+
+
+def unpack_values(bits: int, num_params: int) -> List[bool]:
+    """整数の割り当て（パラメータiはビットi）を True/False のリストに戻す"""
+    if not num_params:
+        return []
+    return [bit == '1' for bit in reversed(format(bits, f'0{num_params}b'))]
+
+
+def choice_groups_as_ids(
+    paths: List[str],
+    choice_groups: Dict[int, List[str]]
+) -> List[List[int]]:
+    """
+    Choice制約グループをパラメータ番号のリストに変換
+
+    pathsに含まれないパスは割り当てが常にFalseなので除外する
+    """
+    path_ids = {path: i for i, path in enumerate(paths)}
+    return [
+        [path_ids[path] for path in group_paths if path in path_ids]
+        for group_paths in choice_groups.values()
+    ]
+
+
+def choice_conflicts(num_paths: int, group_ids: List[List[int]]) -> List[int]:
+    """
+    パラメータごとに、同じchoiceグループに属する他のパラメータの集合を求める
+
+    Returns:
+        パラメータ番号順のビット集合のリスト
+    """
+    conflicts = [0] * num_paths
+    for group in group_ids:
+        group_mask = 0
+        for i in group:
+            group_mask |= 1 << i
+        for i in group:
+            conflicts[i] |= group_mask & ~(1 << i)
+    return conflicts
+
+
+class PairSpace:
+    """
+    パラメータのペアと値の組合せをビット集合で表すためのレイアウト
+
+    パラメータ数をNとし、N×Nの格子を2枚（平面）使う。
+    位置 (i, j) のビット番号は plane * plane_size + i * row_stride + j。
+
+    - 平面0（同値）: 上三角 (i < j) が (True, True)、下三角 (i > j) が (False, False)
+    - 平面1（異値）: 非対角 (i != j) が (v_i, v_j) = (True, False)
+
+    ペア (i, j) (i < j) の (False, True) は平面1の (j, i) に当たるので、
+    4通りの組合せが対角成分以外の2平面にちょうど収まる。
+
+    row_stride はNを8の倍数に切り上げた値で、各行がバイト境界から始まる。
+    この配置により、1パターンがカバーするペアを、ペアごとのループではなく
+    数回の整数演算（C実装の多倍長演算）で計算できる。
+    """
+
+    def __init__(self, num_params: int):
+        """
+        Args:
+            num_params: パラメータ数（オプション項目数）
+        """
+        self.num_params = num_params
+        self.row_stride = max(8, (num_params + 7) // 8 * 8)
+        self.plane_size = num_params * self.row_stride
+
+        row_bytes = self.row_stride // 8
+        all_columns = (1 << num_params) - 1
+        self._row_bytes = row_bytes
+        self._full_row = all_columns.to_bytes(row_bytes, 'little')
+        self._empty_row = bytes(row_bytes)
+        # i < j を満たす位置（上三角）と i > j を満たす位置（下三角）
+        self.upper = int.from_bytes(b''.join(
+            (all_columns & ~((1 << (i + 1)) - 1)).to_bytes(row_bytes, 'little')
+            for i in range(num_params)
+        ), 'little')
+        self.lower = int.from_bytes(b''.join(
+            ((1 << i) - 1).to_bytes(row_bytes, 'little')
+            for i in range(num_params)
+        ), 'little')
+
+    def position(self, i: int, j: int) -> int:
+        """位置 (i, j) の平面内でのビット番号"""
+        return i * self.row_stride + j
+
+    def bit_index(self, i: int, j: int, value_i: bool, value_j: bool) -> int:
+        """ペア (i, j) (i < j) の値の組合せ (value_i, value_j) のビット番号"""
+        if value_i == value_j:
+            # 平面0: (True, True) は上三角、(False, False) は下三角
+            return self.position(i, j) if value_i else self.position(j, i)
+        # 平面1: 先にTrueの方の行
+        if value_i:
+            return self.plane_size + self.position(i, j)
+        return self.plane_size + self.position(j, i)
+
+    def universe(self, excluded_true_pairs: Iterable[Tuple[int, int]] = ()) -> int:
+        """
+        全ペアのビット集合
+
+        Args:
+            excluded_true_pairs: (True, True) を除外するペア (i, j) (i < j)
+
+        Returns:
+            全ペアの4通りの組合せから除外分を除いたビット集合
+        """
+        excluded = bytearray(self.plane_size // 8)
+        for i, j in excluded_true_pairs:
+            position = self.position(i, j)
+            excluded[position >> 3] |= 1 << (position & 7)
+
+        same = (self.upper & ~int.from_bytes(excluded, 'little')) | self.lower
+        different = self.upper | self.lower
+        return same | (different << self.plane_size)
+
+    def row_and_column_masks(self, bits: int, plane: int) -> Tuple[List[int], List[int]]:
+        """
+        ビット集合の1つの平面を、行ごと・列ごとのビット集合に分解
+
+        Args:
+            bits: PairSpace の配置のビット集合
+            plane: 平面番号（0または1）
+
+        Returns:
+            (rows, columns): rows[i] のビット j と columns[j] のビット i は
+            ともに位置 (i, j) のビット
+        """
+        plane_bytes = self.plane_size // 8
+        row_bytes = self._row_bytes
+        data = bits.to_bytes(2 * plane_bytes, 'little')[
+            plane * plane_bytes:(plane + 1) * plane_bytes
+        ]
+
+        rows = [
+            int.from_bytes(data[i * row_bytes:(i + 1) * row_bytes], 'little')
+            for i in range(self.num_params)
+        ]
+        # 列jは各行の同じバイトの同じビットなので、バイトを飛び飛びに取り出して
+        # 2進数の文字列に変換する（行0が最下位ビット）
+        columns = [
+            int(data[j >> 3::row_bytes].translate(_BIT_DIGITS[j & 7])[::-1], 2)
+            for j in range(self.num_params)
+        ]
+        return rows, columns
+
+    def covered_by(self, values: List[bool]) -> int:
+        """
+        割り当てがカバーするペアのビット集合を計算
+
+        Args:
+            values: パラメータ番号順の True/False
+
+        Returns:
+            各ペアについて、割り当てと一致する組合せのビットを立てた集合
+        """
+        if not values:
+            return 0
+
+        assignment = pack_values(values)
+
+        # first: 位置(i, j)のビット = v_i（行iを丸ごと0か1で埋める）
+        first = int.from_bytes(
+            b''.join(self._full_row if value else self._empty_row for value in values),
+            'little'
+        )
+        # second: 位置(i, j)のビット = v_j（割り当てのバイト列を全行に複製する）
+        second = int.from_bytes(
+            assignment.to_bytes(self._row_bytes, 'little') * len(values),
+            'little'
+        )
+
+        both = first & second
+        either = first | second
+        # 下三角のうち v_i, v_j がともにFalseの位置（lower & ~either を負数を作らずに計算）
+        same = (both & self.upper) | ((self.lower | either) ^ either)
+        # v_i かつ not v_j（対角と列N以降は常に0）
+        different = first ^ both
+
+        return same | (different << self.plane_size)
+
+
+@dataclass(**DATACLASS_SLOTS)
 class TestPattern:
     """
     テストパターン（1つのXMLに対応）
@@ -20,18 +224,19 @@ class TestPattern:
     Attributes:
         pattern_id: パターンID
         assignments: {path: True/False} のマッピング
-        covered_pairs: このパターンがカバーするペアの集合
+        covered_pairs: このパターンがカバーするペアのビット集合
+                       （ビット配置は PairSpace を参照）
     """
     pattern_id: int
     assignments: Dict[str, bool]
-    covered_pairs: Set[Tuple[Tuple[str, bool], Tuple[str, bool]]] = field(default_factory=set)
+    covered_pairs: int = 0
 
     def get_assignment(self, path: str) -> bool:
         """パスの割り当てを取得（デフォルトFalse）"""
         return self.assignments.get(path, False)
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class CoveringArray:
     """
     ペアワイズカバーリング配列
@@ -52,14 +257,15 @@ class PairwiseCoverageGenerator:
     """
     ペアワイズカバーリング配列を生成するクラス
 
-    Greedy アルゴリズムを使用して、すべての2-wayペアを
+    Greedy アルゴリズムまたは IPOG アルゴリズムを使用して、すべての2-wayペアを
     カバーする最小のパターンセットを生成する。
     """
 
     def __init__(self, algorithm: str = "greedy", random_seed: int = 42):
         """
         Args:
-            algorithm: "greedy" のみサポート
+            algorithm: "greedy"（ランダム候補からの貪欲選択）または
+                       "ipog"（パラメータ順の決定的構築）
             random_seed: 乱数シード
         """
         self.algorithm = algorithm
@@ -93,6 +299,12 @@ class PairwiseCoverageGenerator:
                 max_patterns,
                 choice_groups or {}
             )
+        elif self.algorithm == "ipog":
+            return self._ipog_pairwise(
+                optional_paths,
+                max_patterns,
+                choice_groups or {}
+            )
         else:
             raise ValueError(f"Unknown algorithm: {self.algorithm}")
 
@@ -112,11 +324,17 @@ class PairwiseCoverageGenerator:
         """
         print(f"ペアワイズ生成開始: {len(paths)}個のオプション項目")
 
+        # ペアのビット配置
+        self._pair_space = PairSpace(len(paths))
+        # 内部ではパスをパラメータ番号（pathsでの位置）で扱う
+        group_ids = choice_groups_as_ids(paths, choice_groups)
+
         # すべてのペアを列挙
-        all_pairs = self._enumerate_all_pairs(paths, choice_groups)
-        print(f"  全ペア数: {len(all_pairs)}")
+        all_pairs = self._enumerate_all_pairs(group_ids)
+        total_pairs = popcount(all_pairs)
+        print(f"  全ペア数: {total_pairs}")
 
-        uncovered_pairs = set(all_pairs)
+        uncovered_pairs = all_pairs
         patterns: List[TestPattern] = []
         pattern_id = 0
 
@@ -125,25 +343,25 @@ class PairwiseCoverageGenerator:
         pattern1 = self._create_pattern(
             pattern_id,
             paths,
-            {path: True for path in paths},
-            choice_groups
+            [True] * len(paths),
+            group_ids
         )
         patterns.append(pattern1)
-        uncovered_pairs -= pattern1.covered_pairs
+        uncovered_pairs &= ~pattern1.covered_pairs
         pattern_id += 1
-        print(f"  パターン{pattern1.pattern_id}: {len(pattern1.covered_pairs)}ペアカバー, 残り{len(uncovered_pairs)}ペア")
+        print(f"  パターン{pattern1.pattern_id}: {popcount(pattern1.covered_pairs)}ペアカバー, 残り{popcount(uncovered_pairs)}ペア")
 
         # パターン2: すべてFalse
         pattern2 = self._create_pattern(
             pattern_id,
             paths,
-            {path: False for path in paths},
-            choice_groups
+            [False] * len(paths),
+            group_ids
         )
         patterns.append(pattern2)
-        uncovered_pairs -= pattern2.covered_pairs
+        uncovered_pairs &= ~pattern2.covered_pairs
         pattern_id += 1
-        print(f"  パターン{pattern2.pattern_id}: {len(pattern2.covered_pairs)}ペアカバー, 残り{len(uncovered_pairs)}ペア")
+        print(f"  パターン{pattern2.pattern_id}: {popcount(pattern2.covered_pairs)}ペアカバー, 残り{popcount(uncovered_pairs)}ペア")
 
         # 残りのペアをカバーするパターンを貪欲的に追加
         iteration = 0
@@ -155,24 +373,23 @@ class PairwiseCoverageGenerator:
                 pattern_id,
                 paths,
                 uncovered_pairs,
-                choice_groups,
+                group_ids,
                 num_candidates=50  # 候補数を制限して高速化
             )
 
-            if best_pattern is None or len(best_pattern.covered_pairs) == 0:
+            if best_pattern is None or best_pattern.covered_pairs == 0:
                 # これ以上改善できない
                 break
 
             patterns.append(best_pattern)
-            uncovered_pairs -= best_pattern.covered_pairs
+            uncovered_pairs &= ~best_pattern.covered_pairs
             pattern_id += 1
 
-            if iteration % 5 == 0 or len(uncovered_pairs) == 0:
-                print(f"  パターン{best_pattern.pattern_id}: {len(best_pattern.covered_pairs)}ペアカバー, 残り{len(uncovered_pairs)}ペア")
+            if iteration % 5 == 0 or uncovered_pairs == 0:
+                print(f"  パターン{best_pattern.pattern_id}: {popcount(best_pattern.covered_pairs)}ペアカバー, 残り{popcount(uncovered_pairs)}ペア")
 
         # カバレッジ計算
-        total_pairs = len(all_pairs)
-        covered_pairs = total_pairs - len(uncovered_pairs)
+        covered_pairs = total_pairs - popcount(uncovered_pairs)
         coverage = covered_pairs / total_pairs if total_pairs > 0 else 1.0
 
         print(f"ペアワイズ生成完了:")
@@ -186,57 +403,175 @@ class PairwiseCoverageGenerator:
             strength=2
         )
 
-    def _enumerate_all_pairs(
+    def _ipog_pairwise(
         self,
         paths: List[str],
+        max_patterns: int,
         choice_groups: Dict[int, List[str]]
-    ) -> Set[Tuple[Tuple[str, bool], Tuple[str, bool]]]:
+    ) -> CoveringArray:
+        """
+        IPOG（In-Parameter-Order）アルゴリズムでペアワイズ配列を生成
+
+        パラメータを1つずつ追加しながら配列を構築する（乱数は使わない）。
+        パラメータkを追加するときの手順:
+        1. 水平拡張: 既存の各行について、前のパラメータとの未カバーペアを
+           最も多くカバーする値をkに割り当てる。行の未割り当て（don't care）の
+           パラメータは、未カバーペアをカバーする値で埋める
+        2. 垂直拡張: 残った未カバーペアを、未割り当てのパラメータを
+           埋めるか、新しい行を追加してカバーする
+        最後に未割り当てのパラメータはFalseにする。
+        """
+        print(f"ペアワイズ生成開始（IPOG）: {len(paths)}個のオプション項目")
+
+        # ペアのビット配置
+        self._pair_space = PairSpace(len(paths))
+        # 内部ではパスをパラメータ番号（pathsでの位置）で扱う
+        group_ids = choice_groups_as_ids(paths, choice_groups)
+
+        # すべてのペアを列挙
+        all_pairs = self._enumerate_all_pairs(group_ids)
+        total_pairs = popcount(all_pairs)
+        print(f"  全ペア数: {total_pairs}")
+
+        conflicts = choice_conflicts(len(paths), group_ids)
+
+        # 各行は「Trueを割り当てたパラメータ」「Falseを割り当てたパラメータ」の
+        # ビット集合の組で表す（どちらにもないパラメータは未割り当て）
+        # 最初のパラメータの値 True/False で初期化
+        rows_true: List[int] = [1, 0] if paths else []
+        rows_false: List[int] = [0, 1] if paths else []
+
+        for k in range(1, len(paths)):
+            bit_k = 1 << k
+            earlier = bit_k - 1
+            # uncovered[v_j][v_k]: (v_j, v_k) の組合せが未カバーのパラメータj（j < k）の集合
+            # 同じchoiceグループのパラメータとの (True, True) は除外
+            uncovered = [[earlier, earlier], [earlier, earlier & ~conflicts[k]]]
+
+            # 水平拡張: 既存の各行にkの値を割り当てる
+            for r in range(len(rows_true)):
+                row_true = rows_true[r]
+                row_false = rows_false[r]
+                # 未割り当てのパラメータjは、必要な値を後から入れてペアをカバーできる
+                free = earlier & ~(row_true | row_false)
+
+                # 未カバーペアを多くカバーする値を選ぶ（同点ならFalse）
+                gains = [
+                    popcount(row_true & uncovered[True][value]) +
+                    popcount(row_false & uncovered[False][value]) +
+                    popcount(free & (uncovered[True][value] | uncovered[False][value]))
+                    for value in (False, True)
+                ]
+                value = gains[True] > gains[False] and not row_true & conflicts[k]
+
+                uncovered[True][value] &= ~row_true
+                uncovered[False][value] &= ~row_false
+
+                # 未割り当てのjを埋めて (j, k) の未カバーペアをカバーする
+                # Trueはchoice制約に反しない場合のみ
+                want_true = free & uncovered[True][value]
+                while want_true:
+                    bit_j = want_true & -want_true
+                    want_true ^= bit_j
+                    if not rows_true[r] & conflicts[bit_j.bit_length() - 1]:
+                        rows_true[r] |= bit_j
+                        uncovered[True][value] &= ~bit_j
+                want_false = free & uncovered[False][value] & ~rows_true[r]
+                rows_false[r] |= want_false
+                uncovered[False][value] &= ~want_false
+
+                if value:
+                    rows_true[r] |= bit_k
+                else:
+                    rows_false[r] |= bit_k
+
+            # 垂直拡張: 残りの未カバーペアを1つずつカバーする
+            for value_j in (False, True):
+                for value_k in (False, True):
+                    remaining = uncovered[value_j][value_k]
+                    while remaining:
+                        bit_j = remaining & -remaining
+                        remaining ^= bit_j
+                        j = bit_j.bit_length() - 1
+
+                        # kの値が一致し、jが未割り当ての行を探す
+                        for r in range(len(rows_true)):
+                            rows_k = rows_true if value_k else rows_false
+                            if not rows_k[r] & bit_k:
+                                continue
+                            if (rows_true[r] | rows_false[r]) & bit_j:
+                                continue
+                            if value_j and rows_true[r] & conflicts[j]:
+                                continue
+                            break
+                        else:
+                            # 見つからなければ新しい行を追加
+                            rows_true.append(bit_k if value_k else 0)
+                            rows_false.append(0 if value_k else bit_k)
+                            r = len(rows_true) - 1
+
+                        if value_j:
+                            rows_true[r] |= bit_j
+                        else:
+                            rows_false[r] |= bit_j
+
+        if len(rows_true) > max_patterns:
+            print(f"  警告: 必要なパターン数{len(rows_true)}が最大パターン数{max_patterns}を超えるため切り詰めます")
+
+        # パターンを作成（未割り当てのパラメータはFalse）
+        uncovered_pairs = all_pairs
+        patterns: List[TestPattern] = []
+        for pattern_id, row_true in enumerate(rows_true[:max_patterns]):
+            values = [bool(row_true >> i & 1) for i in range(len(paths))]
+            pattern = self._finalize_pattern(pattern_id, paths, values)
+            patterns.append(pattern)
+            uncovered_pairs &= ~pattern.covered_pairs
+
+        # カバレッジ計算
+        covered_pairs = total_pairs - popcount(uncovered_pairs)
+        coverage = covered_pairs / total_pairs if total_pairs > 0 else 1.0
+
+        print(f"ペアワイズ生成完了:")
+        print(f"  生成パターン数: {len(patterns)}")
+        print(f"  カバレッジ: {coverage*100:.2f}% ({covered_pairs}/{total_pairs})")
+
+        return CoveringArray(
+            parameters=paths,
+            patterns=patterns,
+            coverage=coverage,
+            strength=2
+        )
+
+    def _enumerate_all_pairs(self, group_ids: List[List[int]]) -> int:
         """
         すべてのペアを列挙
 
         各パラメータは True/False の2値を取るので、
-        ペアは ((path1, value1), (path2, value2)) の形式
+        ペアごとに (値1, 値2) の4通りの組合せがある。
+
+        Args:
+            group_ids: Choice制約（パラメータ番号のリスト）
 
         Returns:
-            ペアの集合
+            全ペアのビット集合（ビット配置は PairSpace を参照）
         """
-        pairs = set()
-
-        # すべてのパスのペアを列挙
-        for path1, path2 in combinations(paths, 2):
-            # choice制約のチェック: 同じグループなら両方Trueは不可
-            if self._are_in_same_choice_group(path1, path2, choice_groups):
-                # (True, True)の組合せは除外
-                pairs.add(((path1, True), (path2, False)))
-                pairs.add(((path1, False), (path2, True)))
-                pairs.add(((path1, False), (path2, False)))
-            else:
-                # 通常のペア（4通り）
-                pairs.add(((path1, True), (path2, True)))
-                pairs.add(((path1, True), (path2, False)))
-                pairs.add(((path1, False), (path2, True)))
-                pairs.add(((path1, False), (path2, False)))
-
-        return pairs
-
-    def _are_in_same_choice_group(
-        self,
-        path1: str,
-        path2: str,
-        choice_groups: Dict[int, List[str]]
-    ) -> bool:
-        """2つのパスが同じchoiceグループに属するか"""
-        for group_paths in choice_groups.values():
-            if path1 in group_paths and path2 in group_paths:
-                return True
-        return False
+        # choice制約: 同じグループのペアは両方Trueにできないので(True, True)は除外
+        # 全ペアを走査せず、グループ内のペアだけを列挙する
+        same_group_pairs = (
+            pair
+            for group in group_ids
+            for pair in combinations(sorted(set(group)), 2)
+        )
+
+        # 通常のペアは4通りすべて、choice制約のあるペアは(True, True)以外
+        return self._pair_space.universe(same_group_pairs)
 
     def _create_pattern(
         self,
         pattern_id: int,
         paths: List[str],
-        assignments: Dict[str, bool],
-        choice_groups: Dict[int, List[str]]
+        values: List[bool],
+        group_ids: List[List[int]]
     ) -> TestPattern:
         """
         パターンを作成し、カバーするペアを計算
@@ -244,54 +579,64 @@ class PairwiseCoverageGenerator:
         Args:
             pattern_id: パターンID
             paths: すべてのオプションパス
-            assignments: 割り当て
-            choice_groups: Choice制約
+            values: パラメータ番号順の割り当て
+            group_ids: Choice制約（パラメータ番号のリスト）
 
         Returns:
             TestPattern
         """
         # Choice制約を考慮して割り当てを調整
-        adjusted_assignments = self._adjust_for_choice_constraints(
-            assignments,
-            choice_groups
-        )
+        adjusted_values = self._adjust_for_choice_constraints(values, group_ids)
 
-        # このパターンがカバーするペアを計算
-        covered_pairs = set()
-        for path1, path2 in combinations(paths, 2):
-            val1 = adjusted_assignments.get(path1, False)
-            val2 = adjusted_assignments.get(path2, False)
+        return self._finalize_pattern(pattern_id, paths, adjusted_values)
 
-            pair = ((path1, val1), (path2, val2))
-            covered_pairs.add(pair)
+    def _finalize_pattern(
+        self,
+        pattern_id: int,
+        paths: List[str],
+        values: List[bool]
+    ) -> TestPattern:
+        """
+        採用する割り当てからTestPatternを作成
+
+        Args:
+            pattern_id: パターンID
+            paths: すべてのオプションパス
+            values: Choice制約を満たすパラメータ番号順の割り当て
+
+        Returns:
+            TestPattern
+        """
+        # このパターンがカバーするペアを計算
+        covered_pairs = self._pair_space.covered_by(values)
 
         return TestPattern(
             pattern_id=pattern_id,
-            assignments=adjusted_assignments,
+            assignments=dict(zip(paths, values)),
             covered_pairs=covered_pairs
         )
 
     def _adjust_for_choice_constraints(
         self,
-        assignments: Dict[str, bool],
-        choice_groups: Dict[int, List[str]]
-    ) -> Dict[str, bool]:
+        values: List[bool],
+        group_ids: List[List[int]]
+    ) -> List[bool]:
         """
         Choice制約を考慮して割り当てを調整
 
         同じグループで複数がTrueになっている場合、1つだけTrueにする
         """
-        adjusted = assignments.copy()
+        adjusted = list(values)
 
-        for group_paths in choice_groups.values():
-            true_paths = [p for p in group_paths if adjusted.get(p, False)]
+        for group in group_ids:
+            true_ids = [i for i in group if adjusted[i]]
 
-            if len(true_paths) > 1:
+            if len(true_ids) > 1:
                 # 複数がTrueの場合、1つだけ残す（ランダムに選択）
-                selected = random.choice(true_paths)
-                for path in true_paths:
-                    if path != selected:
-                        adjusted[path] = False
+                selected = random.choice(true_ids)
+                for i in true_ids:
+                    if i != selected:
+                        adjusted[i] = False
 
         return adjusted
 
@@ -299,8 +644,8 @@ class PairwiseCoverageGenerator:
         self,
         pattern_id: int,
         paths: List[str],
-        uncovered_pairs: Set[Tuple[Tuple[str, bool], Tuple[str, bool]]],
-        choice_groups: Dict[int, List[str]],
+        uncovered_pairs: int,
+        group_ids: List[List[int]],
         num_candidates: int = 50
     ) -> Optional[TestPattern]:
         """
@@ -308,32 +653,58 @@ class PairwiseCoverageGenerator:
 
         ランダムなパターンを複数生成し、最良のものを選択する
         """
-        best_pattern = None
-        best_score = 0
-
-        for _ in range(num_candidates):
-            # ランダムな割り当てを生成
-            assignments = {
-                path: random.choice([True, False])
-                for path in paths
-            }
-
-            # パターンを作成
-            pattern = self._create_pattern(
-                pattern_id,
-                paths,
-                assignments,
-                choice_groups
-            )
-
-            # スコア計算: 未カバーペアとの重なり
-            score = len(pattern.covered_pairs & uncovered_pairs)
-
-            if score > best_score:
-                best_score = score
-                best_pattern = pattern
-
-        return best_pattern
+        # 全候補分のランダムビットを一度に生成（候補kはビット k*N から N ビット）
+        num_paths = len(paths)
+        random_bits = random.getrandbits(num_candidates * num_paths)
+
+        # 2つ以上のパラメータを含むchoiceグループは、乱数ビットを使わず
+        # 「どれか1つをTrue」または「すべてFalse」から選ぶ（後から調整しない）
+        constrained_groups = [group for group in group_ids if len(group) > 1]
+        conflicts = choice_conflicts(num_paths, constrained_groups)
+        free_mask = (1 << num_paths) - 1
+        for group in constrained_groups:
+            for i in group:
+                free_mask &= ~(1 << i)
+
+        # 候補を生成
+        candidates = []
+        for k in range(num_candidates):
+            # ランダムな割り当てを生成（パラメータiはビットi）
+            bits = (random_bits >> (k * num_paths)) & free_mask
+            for group in constrained_groups:
+                selected = random.randrange(len(group) + 1)
+                # len(group) は「どれもTrueにしない」
+                # 別のグループで既にTrueにしたパラメータと衝突する場合もTrueにしない
+                if selected < len(group) and not bits & conflicts[group[selected]]:
+                    bits |= 1 << group[selected]
+
+            candidates.append(unpack_values(bits, num_paths))
+
+        # スコア計算: 未カバーペアとの重なり
+        scores = self._score_candidates(candidates, uncovered_pairs)
+
+        # 最高スコアの候補（同点なら先に生成したもの）を選ぶ
+        best = max(range(len(candidates)), key=scores.__getitem__, default=None)
+        if best is None or scores[best] == 0:
+            return None
+
+        # 採用する候補だけパターンを作成
+        return self._finalize_pattern(pattern_id, paths, candidates[best])
+
+    def _score_candidates(
+        self,
+        candidates: List[List[bool]],
+        uncovered_pairs: int
+    ) -> List[int]:
+        """各候補がカバーする未カバーペアの数をまとめて計算"""
+        return [
+            self._score_against(values, uncovered_pairs)
+            for values in candidates
+        ]
+
+    def _score_against(self, values: List[bool], uncovered_pairs: int) -> int:
+        """割り当てがカバーする未カバーペアの数"""
+        return popcount(self._pair_space.covered_by(values) & uncovered_pairs)
 
 
 if __name__ == '__main__':
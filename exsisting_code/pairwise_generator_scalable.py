@@ -4,30 +4,62 @@
 
 大規模スキーマに対応するため、メモリ効率を重視した実装。
 - 優先度ベースのオプション項目選択
-- バッチ処理によるメモリ管理
-- 段階的なガベージコレクション
+- ペアの整数ビット集合による表現
+- 候補の割り当てをリストのまま評価し、選ばれたものだけパターン化
 """
 
-from dataclasses import dataclass, field
-from typing import List, Dict, Set, Tuple, Optional, Iterator
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Set, Tuple
 from itertools import combinations
+from math import comb
 import random
-import gc
 
+from compat import DATACLASS_SLOTS, popcount
+from pairwise_generator import (
+    PairSpace, choice_conflicts, choice_groups_as_ids, pack_values, unpack_values
+)
 
-@dataclass
+
+# このパラメータ数以上では、候補のスコアをパラメータごとの行で計算する
+# （未満では候補全体のペアのビット集合を作る方が速い）
+PARTNER_SCORING_MIN_PARAMS = 256
+
+
+@dataclass(**DATACLASS_SLOTS)
 class TestPattern:
-    """テストパターン（1つのXMLに対応）"""
+    """テストパターン（1つのXMLに対応）
+
+    割り当てはパラメータごとの辞書ではなく、ビット集合 values
+    （ビットiが parameters[i] の値）で持つ。parameters と parameter_index
+    （パス → パラメータ番号）は全パターンで共有する。
+    covered_pairs はカバーするペアのビット集合（ビット配置は PairSpace を参照）
+    """
     pattern_id: int
-    assignments: Dict[str, bool]
-    covered_pairs: Set[Tuple[Tuple[str, bool], Tuple[str, bool]]] = field(default_factory=set)
+    parameters: List[str]
+    parameter_index: Dict[str, int]
+    values: int
+    covered_pairs: int = 0
+
+    @property
+    def assignments(self) -> Dict[str, bool]:
+        """
+        {path: True/False} のマッピング
+
+        参照のたびに全パラメータ分の辞書を作るので、呼び出し側で1回だけ取得して使う。
+        個別のパスには get_assignment を使う
+        """
+        values = self.values
+        return {path: bool(values >> i & 1) for i, path in enumerate(self.parameters)}
 
     def get_assignment(self, path: str) -> bool:
         """パスの割り当てを取得（デフォルトFalse）"""
-        return self.assignments.get(path, False)
+        index = self.parameter_index.get(path)
+        if index is None:
+            return False
+        return bool(self.values >> index & 1)
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class CoveringArray:
     """ペアワイズカバーリング配列"""
     parameters: List[str]
@@ -42,15 +74,15 @@ class ScalablePairwiseCoverageGenerator:
 
     改善点:
     1. 優先度ベースのオプション項目選択
-    2. バッチ処理によるメモリ効率化
-    3. 明示的なガベージコレクション
-    4. ペアの段階的生成
+    2. ペアのビット集合によるメモリ効率化
+    3. 候補ごとのオブジェクト生成を避ける
     """
 
     def __init__(self, algorithm: str = "greedy", random_seed: int = 42):
         """
         Args:
-            algorithm: "greedy" のみサポート
+            algorithm: "greedy"（ランダム候補からの貪欲選択）または
+                       "aetg"（1パラメータずつ値を決める決定的構築）
             random_seed: 乱数シード
         """
         self.algorithm = algorithm
@@ -94,7 +126,7 @@ class ScalablePairwiseCoverageGenerator:
 
             print(f"  制限後: {len(optional_paths)}個")
 
-        if self.algorithm == "greedy":
+        if self.algorithm in ("greedy", "aetg"):
             return self._greedy_pairwise_scalable(
                 optional_paths,
                 max_patterns,
@@ -113,16 +145,36 @@ class ScalablePairwiseCoverageGenerator:
         メモリ効率的な貪欲アルゴリズムでペアワイズ配列を生成
 
         改善点:
-        1. ペアをバッチで処理
+        1. 未カバーペアを1つのビット集合で管理
         2. 不要なデータの即座削除
-        3. 明示的なGC実行
         """
         print(f"スケーラブルなペアワイズ生成開始: {len(paths)}個のオプション項目")
 
-        # ペア総数を計算（メモリには保持しない）
-        total_pairs = self._count_total_pairs(paths, choice_groups)
+        # ペアのビット配置
+        # ペアの集合を (パス, 値) のタプルのsetではなく整数のビット集合で持つ
+        self._pair_space = PairSpace(len(paths))
+        # 内部ではパスをパラメータ番号（pathsでの位置）で扱う
+        # （パス → パラメータ番号は全パターンで共有する）
+        self._parameter_index = {path: i for i, path in enumerate(paths)}
+        group_ids = choice_groups_as_ids(paths, choice_groups)
+        conflicts = choice_conflicts(len(paths), group_ids)
+        group_masks = self._choice_group_masks(group_ids)
+
+        # 候補のスコア計算方法はパラメータ数で一度だけ選ぶ
+        if len(paths) >= PARTNER_SCORING_MIN_PARAMS:
+            self._score_candidates = self._score_candidates_by_partners
+        else:
+            self._score_candidates = self._score_candidates_by_pairs
+
+        # ペア総数を計算
+        same_group_pairs = self._same_group_pairs(group_ids)
+        total_pairs = self._count_total_pairs(len(paths), same_group_pairs)
         print(f"  全ペア数: {total_pairs}")
 
+        # 未カバーペアのビット集合（同じchoiceグループの(True, True)は最初から含めない）
+        # 差集合は uncovered & pattern の1回の演算で求まる
+        uncovered_pairs = self._pair_space.universe(same_group_pairs)
+
         patterns: List[TestPattern] = []
         pattern_id = 0
 
@@ -134,91 +186,91 @@ class ScalablePairwiseCoverageGenerator:
         pattern1 = self._create_pattern_scalable(
             pattern_id,
             paths,
-            {path: True for path in paths},
-            choice_groups
+            (1 << len(paths)) - 1,
+            group_masks
         )
         patterns.append(pattern1)
-        covered_count += len(pattern1.covered_pairs)
+        covered_count += popcount(pattern1.covered_pairs)
         pattern_id += 1
 
-        print(f"  パターン{pattern1.pattern_id}: {len(pattern1.covered_pairs)}ペアカバー, " +
+        print(f"  パターン{pattern1.pattern_id}: {popcount(pattern1.covered_pairs)}ペアカバー, " +
               f"残り{total_pairs - covered_count}ペア")
 
-        # パターン1のカバーペアを保持（後で除外に使用）
-        covered_pairs = pattern1.covered_pairs.copy()
+        # パターン1のカバーペアを除外
+        uncovered_pairs ^= pattern1.covered_pairs & uncovered_pairs
 
-        # パターン1の大きなセットを削除してメモリ解放
-        pattern1.covered_pairs = set()
-        gc.collect()
+        # パターン1のビット集合を削除してメモリ解放
+        pattern1.covered_pairs = 0
 
         # パターン2: すべてFalse
         pattern2 = self._create_pattern_scalable(
             pattern_id,
             paths,
-            {path: False for path in paths},
-            choice_groups
+            0,
+            group_masks
         )
 
         # パターン2の新規カバーペアのみカウント
-        new_pairs = pattern2.covered_pairs - covered_pairs
-        covered_count += len(new_pairs)
+        new_pairs = pattern2.covered_pairs & uncovered_pairs
+        covered_count += popcount(new_pairs)
         patterns.append(pattern2)
         pattern_id += 1
 
-        print(f"  パターン{pattern2.pattern_id}: {len(new_pairs)}ペアカバー, " +
+        print(f"  パターン{pattern2.pattern_id}: {popcount(new_pairs)}ペアカバー, " +
               f"残り{total_pairs - covered_count}ペア")
 
-        # カバー済みペアを更新
-        covered_pairs.update(pattern2.covered_pairs)
-        pattern2.covered_pairs = set()
-        gc.collect()
+        # 未カバーペアを更新
+        uncovered_pairs ^= new_pairs
+        pattern2.covered_pairs = 0
 
         # 残りのペアをカバーするパターンを貪欲的に追加
         iteration = 0
-        batch_size = 10  # 10パターンごとにGC実行
 
         while covered_count < total_pairs and len(patterns) < max_patterns:
             iteration += 1
 
             # 最良のパターンを見つける
-            best_pattern = self._find_best_pattern_scalable(
-                pattern_id,
-                paths,
-                covered_pairs,
-                choice_groups,
-                num_candidates=30  # 候補数を制限してメモリ節約
-            )
+            if self.algorithm == "aetg":
+                best_pattern = self._construct_pattern_aetg(
+                    pattern_id,
+                    paths,
+                    uncovered_pairs,
+                    conflicts
+                )
+            else:
+                best_pattern = self._find_best_pattern_scalable(
+                    pattern_id,
+                    paths,
+                    uncovered_pairs,
+                    total_pairs - covered_count,
+                    group_masks,
+                    conflicts,
+                    num_candidates=30  # 候補数を制限してメモリ節約
+                )
 
             if best_pattern is None:
                 break
 
             # 新規カバーペアのみカウント
-            new_pairs = best_pattern.covered_pairs - covered_pairs
-            if len(new_pairs) == 0:
+            new_pairs = best_pattern.covered_pairs & uncovered_pairs
+            if new_pairs == 0:
                 # これ以上改善できない
                 break
 
-            covered_count += len(new_pairs)
+            covered_count += popcount(new_pairs)
             patterns.append(best_pattern)
 
-            # カバー済みペアを更新
-            covered_pairs.update(best_pattern.covered_pairs)
-            best_pattern.covered_pairs = set()
+            # 未カバーペアを更新
+            uncovered_pairs ^= new_pairs
+            best_pattern.covered_pairs = 0
 
             pattern_id += 1
 
-            # 進捗表示とGC
+            # 進捗表示
             if iteration % 5 == 0 or covered_count >= total_pairs:
-                print(f"  パターン{best_pattern.pattern_id}: {len(new_pairs)}ペアカバー, " +
+                print(f"  パターン{best_pattern.pattern_id}: {popcount(new_pairs)}ペアカバー, " +
                       f"残り{total_pairs - covered_count}ペア")
 
-            if iteration % batch_size == 0:
-                gc.collect()
-
-        # 最終GC
-        del covered_pairs
-        gc.collect()
-
         # カバレッジ計算
         coverage = covered_count / total_pairs if total_pairs > 0 else 1.0
 
@@ -235,172 +287,385 @@ class ScalablePairwiseCoverageGenerator:
 
     def _count_total_pairs(
         self,
-        paths: List[str],
-        choice_groups: Dict[int, List[str]]
+        num_paths: int,
+        same_group_pairs: Set[Tuple[int, int]]
     ) -> int:
         """
         ペア総数を計算（メモリには保持しない）
+
+        全ペアの4通りから、同じchoiceグループのペアの(True, True)を除いた数。
+        全ペアを走査せず、グループ内のペアだけを列挙する。
         """
-        count = 0
+        return 4 * comb(num_paths, 2) - len(same_group_pairs)
 
-        for path1, path2 in combinations(paths, 2):
-            if self._are_in_same_choice_group(path1, path2, choice_groups):
-                # (True, True)を除く3通り
-                count += 3
-            else:
-                # 通常の4通り
-                count += 4
+    def _same_group_pairs(self, group_ids: List[List[int]]) -> Set[Tuple[int, int]]:
+        """
+        同じchoiceグループに属するペア (i, j) (i < j) の集合
 
-        return count
+        複数のグループで重なるペアも1つとして扱う
+        """
+        same_group_pairs = set()
+        for group in group_ids:
+            same_group_pairs.update(combinations(sorted(set(group)), 2))
+        return same_group_pairs
+
+    def _choice_group_masks(self, group_ids: List[List[int]]) -> List[int]:
+        """
+        Choice制約グループごとのパラメータのビット集合
+
+        2つ以上のパラメータを含むグループだけを返す（1つなら調整は不要）
+        """
+        group_masks = []
+        for group in group_ids:
+            group_mask = 0
+            for i in group:
+                group_mask |= 1 << i
+            if group_mask & (group_mask - 1):
+                group_masks.append(group_mask)
+        return group_masks
 
     def _create_pattern_scalable(
         self,
         pattern_id: int,
         paths: List[str],
-        assignments: Dict[str, bool],
-        choice_groups: Dict[int, List[str]]
+        bits: int,
+        group_masks: List[int]
     ) -> TestPattern:
         """
         パターンを作成（メモリ効率的）
+
+        bits は割り当て（パラメータiはビットi）で、Choice制約に合わせて調整する
         """
         # Choice制約を考慮して割り当てを調整
-        adjusted_assignments = self._adjust_for_choice_constraints(
-            assignments,
-            choice_groups
-        )
-
-        # このパターンがカバーするペアを計算
-        covered_pairs = self._calculate_covered_pairs(
-            paths,
-            adjusted_assignments,
-            choice_groups
-        )
+        bits = self._adjust_for_choice_constraints(bits, group_masks)
+        return self._finalize_pattern(pattern_id, paths, unpack_values(bits, len(paths)))
 
+    def _finalize_pattern(
+        self,
+        pattern_id: int,
+        paths: List[str],
+        values: List[bool]
+    ) -> TestPattern:
+        """調整済みの割り当てから TestPattern を作成"""
         return TestPattern(
             pattern_id=pattern_id,
-            assignments=adjusted_assignments,
-            covered_pairs=covered_pairs
+            parameters=paths,
+            parameter_index=self._parameter_index,
+            values=pack_values(values),
+            covered_pairs=self._calculate_covered_pairs(values)
         )
 
-    def _calculate_covered_pairs(
-        self,
-        paths: List[str],
-        assignments: Dict[str, bool],
-        choice_groups: Dict[int, List[str]]
-    ) -> Set[Tuple[Tuple[str, bool], Tuple[str, bool]]]:
-        """
-        パターンがカバーするペアを計算（バッチ処理）
+    def _calculate_covered_pairs(self, values: List[bool]) -> int:
         """
-        covered_pairs = set()
-
-        # バッチサイズを制限してメモリ効率化
-        batch_size = 10000
-        batch_count = 0
+        パターンがカバーするペアを計算
 
-        for path1, path2 in combinations(paths, 2):
-            val1 = assignments.get(path1, False)
-            val2 = assignments.get(path2, False)
+        Choice制約は調整済みの割り当て（同じグループで両方Trueにならない）を前提とする
 
-            # Choice制約チェック
-            if self._are_in_same_choice_group(path1, path2, choice_groups):
-                if val1 and val2:
-                    # 同じグループで両方Trueは無効、スキップ
-                    continue
-
-            pair = ((path1, val1), (path2, val2))
-            covered_pairs.add(pair)
-
-            batch_count += 1
-            if batch_count >= batch_size:
-                # バッチごとに少し休憩（GCの機会を与える）
-                batch_count = 0
-
-        return covered_pairs
+        Returns:
+            カバーするペアのビット集合
+        """
+        return self._pair_space.covered_by(values)
 
     def _find_best_pattern_scalable(
         self,
         pattern_id: int,
         paths: List[str],
-        covered_pairs: Set[Tuple[Tuple[str, bool], Tuple[str, bool]]],
-        choice_groups: Dict[int, List[str]],
+        uncovered_pairs: int,
+        uncovered_count: int,
+        group_masks: List[int],
+        conflicts: List[int],
         num_candidates: int = 30
     ) -> Optional[TestPattern]:
         """
         未カバーペアを最も多くカバーするパターンを見つける（メモリ効率的）
+
+        候補は割り当てのリストのままスコアを計算し、最良の候補を局所探索で改善する。
+        TestPattern は選ばれた候補についてだけ作成する
         """
-        best_pattern = None
-        best_score = 0
-
-        for _ in range(num_candidates):
-            # ランダムな割り当てを生成
-            assignments = {
-                path: random.choice([True, False])
-                for path in paths
-            }
-
-            # パターンを作成
-            pattern = self._create_pattern_scalable(
-                pattern_id,
-                paths,
-                assignments,
-                choice_groups
-            )
+        # 全候補分のランダムビットを一度に生成（候補cはビット c*N から N ビット）
+        num_paths = len(paths)
+        random_bits = random.getrandbits(num_candidates * num_paths)
+        all_params = (1 << num_paths) - 1
+
+        # 候補を生成
+        candidates = []
+        for c in range(num_candidates):
+            # ランダムな割り当て（パラメータiはビットi）を生成し、Choice制約に合わせて調整
+            bits = (random_bits >> (c * num_paths)) & all_params
+            bits = self._adjust_for_choice_constraints(bits, group_masks)
+            candidates.append(unpack_values(bits, num_paths))
+
+        # スコア計算: 未カバーペアとの重なり
+        # パラメータごとの未カバーペアの相手は、スコア計算と局所探索で共有する
+        partners = self._uncovered_partners(uncovered_pairs)
+        scores = self._score_candidates(candidates, uncovered_pairs, partners, uncovered_count)
+
+        # 最高スコアの候補（同点なら先に生成したもの）を選ぶ
+        best = max(range(len(scores)), key=scores.__getitem__, default=None)
+        if best is None:
+            return None
+
+        values = candidates[best]
+        if scores[best] == 0:
+            # どの候補も未カバーペアをカバーしない場合、未カバーペアを1つ割り当てる
+            for k, value in self._seed_pair(uncovered_pairs):
+                values[k] = value
+                if value:
+                    # 同じchoiceグループの他のパラメータはFalseにする
+                    others = conflicts[k]
+                    while others:
+                        lowest = others & -others
+                        values[lowest.bit_length() - 1] = False
+                        others ^= lowest
+
+        if scores[best] < uncovered_count:
+            # 残りをすべてカバーしていれば、局所探索で改善する余地はない
+            self._improve_by_local_search(values, partners, conflicts)
+        return self._finalize_pattern(pattern_id, paths, values)
+
+    def _construct_pattern_aetg(
+        self,
+        pattern_id: int,
+        paths: List[str],
+        uncovered_pairs: int,
+        conflicts: List[int]
+    ) -> Optional[TestPattern]:
+        """
+        AETG方式（1パラメータずつ値を決める）でパターンを構築
 
-            # スコア計算: 未カバーペアとの重なり（サンプリングで高速化）
-            if len(covered_pairs) > 100000:
-                # 大規模な場合、サンプリングでスコア推定
-                sample_size = min(10000, len(pattern.covered_pairs))
-                sample_pairs = random.sample(list(pattern.covered_pairs), sample_size)
-                sample_score = sum(1 for p in sample_pairs if p not in covered_pairs)
-                # スコアを推定値から全体に拡大
-                score = int(sample_score * len(pattern.covered_pairs) / sample_size)
+        未カバーペアを1つ割り当ててから、残りのパラメータをランダムな順に見て、
+        割り当て済みのパラメータとの未カバーペアを多くカバーする値を選ぶ
+        （同点ならTrue）。同じchoiceグループで既にTrueのパラメータがあればFalseにする。
+        候補は1つだけなので、ランダム候補を多数評価するより計算が少ない。
+        """
+        if not uncovered_pairs:
+            return None
+
+        true_true, true_false, false_true, false_false = self._uncovered_partners(uncovered_pairs)
+
+        values = [False] * len(paths)
+        assigned_true = 0
+        assigned_false = 0
+
+        # 未カバーペアを1つ先に割り当て、必ず1ペア以上カバーする
+        seed = self._seed_pair(uncovered_pairs)
+        for k, value in seed:
+            values[k] = value
+            if value:
+                assigned_true |= 1 << k
             else:
-                # 小規模な場合、正確に計算
-                score = len(pattern.covered_pairs - covered_pairs)
-
-            if score > best_score:
-                best_score = score
-                # 古いベストパターンを削除
-                if best_pattern is not None:
-                    del best_pattern
-                best_pattern = pattern
+                assigned_false |= 1 << k
+
+        # 残りのパラメータの順番はランダム（AETG）
+        seeded = {k for k, _ in seed}
+        order = [k for k in range(len(paths)) if k not in seeded]
+        random.shuffle(order)
+
+        for k in order:
+            gain_true = (popcount(true_true[k] & assigned_true) +
+                         popcount(true_false[k] & assigned_false))
+            gain_false = (popcount(false_true[k] & assigned_true) +
+                          popcount(false_false[k] & assigned_false))
+
+            if gain_true >= gain_false and not conflicts[k] & assigned_true:
+                values[k] = True
+                assigned_true |= 1 << k
             else:
-                # このパターンは不要なので削除
-                del pattern
+                assigned_false |= 1 << k
 
-        return best_pattern
+        self._improve_by_local_search(values, (true_true, true_false, false_true, false_false), conflicts)
+        return self._finalize_pattern(pattern_id, paths, values)
 
-    def _adjust_for_choice_constraints(
+    def _seed_pair(self, uncovered_pairs: int) -> Tuple[Tuple[int, bool], Tuple[int, bool]]:
+        """
+        未カバーペアを1つ（最下位ビット）選び、その割り当てを返す
+
+        Returns:
+            ((i, v_i), (j, v_j))
+        """
+        space = self._pair_space
+        bit = (uncovered_pairs & -uncovered_pairs).bit_length() - 1
+        plane, position = divmod(bit, space.plane_size)
+        row, column = divmod(position, space.row_stride)
+        # 平面0の上三角は (True, True)、下三角は (False, False)、平面1は行がTrue
+        if plane == 0:
+            return (row, row < column), (column, row < column)
+        return (row, True), (column, False)
+
+    def _uncovered_partners(
         self,
-        assignments: Dict[str, bool],
-        choice_groups: Dict[int, List[str]]
-    ) -> Dict[str, bool]:
-        """Choice制約を考慮して割り当てを調整"""
-        adjusted = assignments.copy()
+        uncovered_pairs: int
+    ) -> Tuple[List[int], List[int], List[int], List[int]]:
+        """
+        パラメータごとに、未カバーペアの相手を値の組合せ別に求める
 
-        for group_paths in choice_groups.values():
-            true_paths = [p for p in group_paths if adjusted.get(p, False)]
+        Returns:
+            (true_true, true_false, false_true, false_false):
+            例えば true_false[k] のビットjは、(v_k, v_j) = (True, False) が未カバーであることを表す
+        """
+        space = self._pair_space
+        same_rows, same_columns = space.row_and_column_masks(uncovered_pairs, 0)
+        different_rows, different_columns = space.row_and_column_masks(uncovered_pairs, 1)
+
+        # 平面0: 行kの j > k と列kの j < k が (True, True)、残りが (False, False)
+        true_true = []
+        false_false = []
+        for k in range(space.num_params):
+            below = (1 << k) - 1
+            true_true.append((same_rows[k] & ~below) | (same_columns[k] & below))
+            false_false.append((same_rows[k] & below) | (same_columns[k] & ~below))
+
+        # 平面1: 行kが (v_k, v_j) = (True, False)、列kが (False, True)
+        return true_true, different_rows, different_columns, false_false
+
+    def _improve_by_local_search(
+        self,
+        values: List[bool],
+        partners: Tuple[List[int], List[int], List[int], List[int]],
+        conflicts: List[int]
+    ) -> None:
+        """
+        1パラメータずつ値を反転する山登り法で割り当てを改善（values をその場で書き換える）
 
-            if len(true_paths) > 1:
-                # 複数がTrueの場合、1つだけ残す
-                selected = random.choice(true_paths)
-                for path in true_paths:
-                    if path != selected:
-                        adjusted[path] = False
+        パラメータkの反転で変わるのはkを含むペアだけなので、反転による
+        未カバーペア数の増減はkの行と列のビット集合から求まる。
+        増加が最大の反転を、増加がなくなるまで繰り返す。
+        同じchoiceグループで既にTrueのパラメータがあれば、Trueへの反転はしない。
+        """
+        true_true, true_false, false_true, false_false = partners
+
+        assigned_true = pack_values(values)
+        assigned_false = ((1 << len(values)) - 1) ^ assigned_true
+
+        # margins[k]: kをTrueにした場合とFalseにした場合の、他のパラメータとの
+        # 未カバーペアの数の差（対角は常に0）
+        margins = [
+            popcount(true_true[k] & assigned_true) +
+            popcount(true_false[k] & assigned_false) -
+            popcount(false_true[k] & assigned_true) -
+            popcount(false_false[k] & assigned_false)
+            for k in range(len(values))
+        ]
+
+        for _ in range(len(values)):
+            best_delta = 0
+            best_k = -1
+            for k, value in enumerate(values):
+                if value:
+                    delta = -margins[k]
+                elif conflicts[k] & assigned_true:
+                    continue
+                else:
+                    delta = margins[k]
 
-        return adjusted
+                if delta > best_delta:
+                    best_delta = delta
+                    best_k = k
 
-    def _are_in_same_choice_group(
+            if best_k < 0:
+                break
+
+            values[best_k] = not values[best_k]
+            assigned_true ^= 1 << best_k
+            assigned_false ^= 1 << best_k
+
+            # best_k の反転で変わるのは、best_k とのペアの分だけ
+            # ペアは対称なので、変化する k は best_k の行と列のビット集合から分かる
+            step = 1 if values[best_k] else -1
+            for mask, change in (
+                (true_true[best_k], step),
+                (false_false[best_k], step),
+                (true_false[best_k], -step),
+                (false_true[best_k], -step)
+            ):
+                while mask:
+                    lowest = mask & -mask
+                    margins[lowest.bit_length() - 1] += change
+                    mask ^= lowest
+
+    def _score_candidates_by_pairs(
         self,
-        path1: str,
-        path2: str,
-        choice_groups: Dict[int, List[str]]
-    ) -> bool:
-        """2つのパスが同じchoiceグループに属するか"""
-        for group_paths in choice_groups.values():
-            if path1 in group_paths and path2 in group_paths:
-                return True
-        return False
+        candidates: List[List[bool]],
+        uncovered_pairs: int,
+        partners: Tuple[List[int], List[int], List[int], List[int]],
+        uncovered_count: int
+    ) -> List[int]:
+        """
+        各候補がカバーする未カバーペアの数をまとめて計算（パラメータ数が少ない場合）
+
+        候補がカバーするペアのビット集合と未カバーペアとの積の要素数を数える。
+        残りの未カバーペアをすべてカバーする候補があれば、それより良い候補は
+        ないので、以降の候補は計算しない（返すリストはそこまで）
+        """
+        scores = []
+        for values in candidates:
+            scores.append(popcount(self._calculate_covered_pairs(values) & uncovered_pairs))
+            if scores[-1] >= uncovered_count:
+                break
+
+        return scores
+
+    def _score_candidates_by_partners(
+        self,
+        candidates: List[List[bool]],
+        uncovered_pairs: int,
+        partners: Tuple[List[int], List[int], List[int], List[int]],
+        uncovered_count: int
+    ) -> List[int]:
+        """
+        各候補がカバーする未カバーペアの数をまとめて計算（パラメータ数が多い場合）
+
+        候補ごとにN×Nのビット集合を作らず、パラメータkごとに
+        未カバーペアの相手（Nビット）と候補の True/False の集合との積の要素数を足す。
+        各ペアは両端のパラメータで1回ずつ数えるので、合計の半分がスコア
+
+        残りの未カバーペアをすべてカバーする候補があれば、それより良い候補は
+        ないので、以降の候補は計算しない（返すリストはそこまで）
+        """
+        true_true, true_false, false_true, false_false = partners
+        all_params = (1 << len(true_true)) - 1
+
+        scores = []
+        for values in candidates:
+            assigned_true = pack_values(values)
+            assigned_false = all_params ^ assigned_true
+
+            total = 0
+            for k, value in enumerate(values):
+                if value:
+                    total += (popcount(true_true[k] & assigned_true) +
+                              popcount(true_false[k] & assigned_false))
+                else:
+                    total += (popcount(false_true[k] & assigned_true) +
+                              popcount(false_false[k] & assigned_false))
+            scores.append(total // 2)
+            if scores[-1] >= uncovered_count:
+                break
+
+        return scores
+
+    def _adjust_for_choice_constraints(
+        self,
+        bits: int,
+        group_masks: List[int]
+    ) -> int:
+        """
+        Choice制約を考慮して割り当て（パラメータiはビットi）を調整
+
+        グループごとのTrueの集合は bits & group_mask で求まるので、
+        Trueが1つ以下のグループはパラメータを1つずつ見ずに済む
+        """
+        for group_mask in group_masks:
+            true_bits = bits & group_mask
+
+            if true_bits & (true_bits - 1):
+                # 複数がTrueの場合、ランダムに1つだけ残す
+                # （番号の小さい方から数えて何番目を残すかを選び、その前のビットを落とす）
+                for _ in range(random.randrange(popcount(true_bits))):
+                    true_bits &= true_bits - 1
+                bits = (bits & ~group_mask) | (true_bits & -true_bits)
+
+        return bits
 
 
 if __name__ == '__main__':
@@ -418,5 +683,4 @@ if __name__ == '__main__':
     print("\n生成されたパターン:")
     for pattern in covering_array.patterns[:5]:
         print(f"  Pattern {pattern.pattern_id}:")
-        true_paths = [p for p, v in pattern.assignments.items() if v]
-        print(f"    True: {len(true_paths)}個")
+        print(f"    True: {popcount(pattern.values)}個")
@@ -8,10 +8,134 @@
 
 import sys
 import os
+import copy
+from dataclasses import dataclass
 from lxml import etree
-from typing import Dict, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 from xml_generator import XMLGenerator
 from pairwise_generator import TestPattern
+from compat import DATACLASS_SLOTS
+
+
+# XSD名前空間とClark表記のタグ名（find/findallに名前空間辞書なしで渡せる）
+_XSD_NAMESPACE = 'http://www.w3.org/2001/XMLSchema'
+_XSD_SCHEMA = f'{{{_XSD_NAMESPACE}}}schema'
+_XSD_SEQUENCE = f'{{{_XSD_NAMESPACE}}}sequence'
+_XSD_CHOICE = f'{{{_XSD_NAMESPACE}}}choice'
+_XSD_ALL = f'{{{_XSD_NAMESPACE}}}all'
+_XSD_SIMPLE_CONTENT = f'{{{_XSD_NAMESPACE}}}simpleContent'
+_XSD_COMPLEX_CONTENT = f'{{{_XSD_NAMESPACE}}}complexContent'
+_XSD_EXTENSION = f'{{{_XSD_NAMESPACE}}}extension'
+_XSD_ELEMENT = f'{{{_XSD_NAMESPACE}}}element'
+_XSD_ATTRIBUTE = f'{{{_XSD_NAMESPACE}}}attribute'
+_XSD_SIMPLE_TYPE = f'{{{_XSD_NAMESPACE}}}simpleType'
+_XSD_COMPLEX_TYPE = f'{{{_XSD_NAMESPACE}}}complexType'
+_XSD_RESTRICTION = f'{{{_XSD_NAMESPACE}}}restriction'
+_XSD_ENUMERATION = f'{{{_XSD_NAMESPACE}}}enumeration'
+
+# 型定義直下の complexContent/extension, simpleContent/extension
+_XSD_COMPLEX_CONTENT_EXTENSION = f'{_XSD_COMPLEX_CONTENT}/{_XSD_EXTENSION}'
+_XSD_SIMPLE_CONTENT_EXTENSION = f'{_XSD_SIMPLE_CONTENT}/{_XSD_EXTENSION}'
+
+# XSDの解析に使うパーサー（全インスタンスで共有する）
+# XSDにはDTD・実体参照・ID属性が不要なので、それらの処理を省く。
+# 空白テキスト・コメントを除くと、定義ノードの子の走査で余分なノードを見なくて済む
+_XSD_PARSER = etree.XMLParser(
+    remove_blank_text=True,
+    remove_comments=True,
+    resolve_entities=False,
+    load_dtd=False,
+    no_network=True,
+    collect_ids=False,
+    huge_tree=True
+)
+
+# パターン上のパスの状態（build_xml がパスIDを添字とする bytearray に格納する）
+_PATH_NOT_IN_PATTERN = 0  # パターンに含まれない（必須として扱う）
+_PATH_EXCLUDED = 1        # パターンで False
+_PATH_INCLUDED = 2        # パターンで True
+
+# 部分木の雛形が未解決であることを表す番兵（解決済みの値は雛形または None）
+_UNRESOLVED = object()
+
+# complexTypeの内容の種類（ContentModel.kind）
+_CONTENT_EMPTY = 0    # 子要素もテキストも持たない（属性のみ、子要素のないcomplexContent）
+_CONTENT_ELEMENT = 1  # sequence/choice/allによる子要素を持つ
+_CONTENT_SIMPLE = 2   # simpleContentによるテキストを持つ
+
+# 組み込み型（ローカル名）ごとのダミー値（string は名前から作るので含めない）
+# 属性値用（_generate_dummy_value）
+_ATTRIBUTE_VALUES_BY_TYPE = {
+    'int': '1',
+    'integer': '1',
+    'decimal': '1.0',
+    'float': '1.0',
+    'double': '1.0',
+    'boolean': 'true',
+    'date': '2024-01-01',
+    'dateTime': '2024-01-01T00:00:00',
+    'time': '12:00:00',
+    'base64Binary': 'U2FtcGxlRGF0YQ==',  # "SampleData" in base64
+    'hexBinary': '48656C6C6F',  # "Hello" in hex
+}
+# 要素のテキスト用（_generate_text_value）
+_TEXT_VALUES_BY_TYPE = {
+    'int': '1',
+    'integer': '100',
+    'decimal': '1.0',
+    'float': '1.0',
+    'double': '1.0',
+    'boolean': 'true',
+    'date': '2024-01-01',
+    'dateTime': '2024-01-01T00:00:00Z',
+    'time': '12:00:00',
+    'base64Binary': 'U2FtcGxlRGF0YQ==',  # "SampleData" in base64
+    'hexBinary': '48656C6C6F',  # "Hello" in hex
+}
+
+# XML Signature（ds:SignatureType）の最小構造で使うQName
+_DS_NAMESPACE = 'http://www.w3.org/2000/09/xmldsig#'
+_DS_SIGNED_INFO = etree.QName(_DS_NAMESPACE, 'SignedInfo')
+_DS_CANONICALIZATION_METHOD = etree.QName(_DS_NAMESPACE, 'CanonicalizationMethod')
+_DS_SIGNATURE_METHOD = etree.QName(_DS_NAMESPACE, 'SignatureMethod')
+_DS_REFERENCE = etree.QName(_DS_NAMESPACE, 'Reference')
+_DS_TRANSFORMS = etree.QName(_DS_NAMESPACE, 'Transforms')
+_DS_TRANSFORM = etree.QName(_DS_NAMESPACE, 'Transform')
+_DS_DIGEST_METHOD = etree.QName(_DS_NAMESPACE, 'DigestMethod')
+_DS_DIGEST_VALUE = etree.QName(_DS_NAMESPACE, 'DigestValue')
+_DS_SIGNATURE_VALUE = etree.QName(_DS_NAMESPACE, 'SignatureValue')
+
+
+def _find_extension(type_def: etree._Element) -> Optional[etree._Element]:
+    """
+    型定義のextensionを取得
+
+    XSDではextensionはcomplexContent/simpleContentの直下にしか現れないため、
+    子孫全体は探索しない（入れ子のローカル型のextensionを拾わない）。
+    """
+    extension = type_def.find(_XSD_COMPLEX_CONTENT_EXTENSION)
+    if extension is None:
+        extension = type_def.find(_XSD_SIMPLE_CONTENT_EXTENSION)
+    return extension
+
+
+@dataclass(**DATACLASS_SLOTS)
+class ContentModel:
+    """
+    complexTypeの内容モデル
+
+    Attributes:
+        kind: 内容の種類（_CONTENT_EMPTY / _CONTENT_ELEMENT / _CONTENT_SIMPLE）
+        simple_base: simpleContentのテキストを生成する型名
+        groups: 子要素を処理するsequence/choice、choiceかどうか、sequenceの場合に
+            処理する子要素宣言の範囲（_sequence_plan の添字のスライス）の組のリスト。
+            型直下のsequence, choice, 基底型の分, extension直下のsequence, choice の順
+            （extensionの基底型をたどった結果を平坦化したもの）。sequenceの中に入れ子の
+            sequence/choiceがあれば、その前後で範囲を分けて文書順に並べる
+    """
+    kind: int
+    simple_base: str
+    groups: List[Tuple[etree._Element, bool, slice]]
 
 
 class PairwiseXMLBuilder:
@@ -20,6 +144,11 @@ class PairwiseXMLBuilder:
 
     既存のXMLGeneratorを活用し、パターンに従って
     オプション要素・属性を選択的に含める。
+
+    パターンごとの状態はbuild_xml内のローカル変数として扱い、インスタンスには
+    スキーマ由来のキャッシュのみを保持する。そのため1つのインスタンスで
+    build_xmlを繰り返し呼び出せる（プロセスごとに1インスタンスを作成して
+    使い回すことを想定。キャッシュは遅延構築のためスレッド間の共有は不可）。
     """
 
     def __init__(
@@ -38,19 +167,18 @@ class PairwiseXMLBuilder:
         self.max_depth = max_depth
 
         # XSDを解析
-        with open(xsd_path, 'r', encoding='utf-8') as f:
-            self.schema_tree = etree.parse(f)
+        self.schema_tree = etree.parse(xsd_path, _XSD_PARSER)
 
         # 名前空間定義（XSD namespace prefix自動検出）
         root = self.schema_tree.getroot()
         self.xsd_prefix = None
         for prefix, ns_uri in root.nsmap.items():
-            if ns_uri == 'http://www.w3.org/2001/XMLSchema':
+            if ns_uri == _XSD_NAMESPACE:
                 self.xsd_prefix = prefix if prefix else 'xs'
                 break
         if not self.xsd_prefix:
             self.xsd_prefix = 'xs'  # デフォルト
-        self.ns = {self.xsd_prefix: 'http://www.w3.org/2001/XMLSchema'}
+        self.ns = {self.xsd_prefix: _XSD_NAMESPACE}
 
         # ターゲット名前空間を取得
         target_ns = root.get('targetNamespace')
@@ -60,6 +188,9 @@ class PairwiseXMLBuilder:
             namespace_map['ns'] = target_ns
         self.namespace_map = namespace_map
 
+        # 生成する要素の名前空間（要素ごとにnamespace_mapを引かない）
+        self._target_ns = namespace_map.get('ns', '')
+
         # XMLGeneratorを初期化（基礎となるXML生成機能を提供）
         self.xml_generator = XMLGenerator(
             xsd_path,
@@ -71,15 +202,60 @@ class PairwiseXMLBuilder:
         self.schema_analyzer = self.xml_generator.schema_analyzer
         self.type_cache = self.xml_generator.type_cache
 
+        # 要素名 → ターゲット名前空間のClark表記のタグ名 のキャッシュ
+        self._tag_cache: Dict[str, str] = {}
+        # _create_element に渡された要素名（ref のプレフィックス付きを含む）→ タグ名
+        # （作成できない要素名は空文字列）
+        self._element_tag_cache: Dict[str, str] = {}
+
+        # 要素定義・型定義の索引（名前 → 定義ノード）
+        self._element_defs: Dict[str, etree._Element] = {}
+        self._type_defs: Dict[str, etree._Element] = {}
+        self._index_definitions()
+
+        # 型定義ノード → 内容モデル のキャッシュ
+        # （キーがノードを参照し続けるので、同じノードには同じプロキシが返る）
+        self._content_model_cache: Dict[etree._Element, ContentModel] = {}
+
+        # (型定義ノード, 基底型を先に並べるか) → 継承分を含む属性宣言 のキャッシュ
+        self._attribute_cache: Dict[Tuple[etree._Element, bool], List[Tuple[str, str, str, bool]]] = {}
+
+        # sequence/choice ノード → 子要素の処理計画 のキャッシュ
+        # （パス文字列は親パス + 接尾辞の連結1回で作れるよう接尾辞も持つ）
+        self._sequence_plan_cache: Dict[etree._Element, List[Tuple[str, str, bool, bool]]] = {}
+        self._choice_plan_cache: Dict[etree._Element, List[Tuple[str, str]]] = {}
+
+        # パス文字列とパスIDの対応（構築中に現れたパスへ順に採番する）
+        self._path_ids: Dict[str, int] = {}
+        self._paths: List[str] = []
+        # (親パスID, sequence/choice/型定義ノード) → 子要素・属性のパスIDのリスト
+        self._child_path_id_cache: Dict[Tuple[int, etree._Element], List[int]] = {}
+
+        # 列挙値・ダミー値のキャッシュ（ローカル型名, (名前, 型名) をキーとする）
+        self._enumeration_cache: Dict[str, Tuple[str, ...]] = {}
+        self._dummy_value_cache: Dict[Tuple[str, str], str] = {}
+        self._text_value_cache: Dict[Tuple[str, str], str] = {}
+
+        # 要素名 → (complexTypeの型定義, simpleTypeのテキスト値, ds:SignatureTypeか)
+        self._element_resolution_cache: Dict[str, Tuple[Optional[etree._Element], Optional[str], bool]] = {}
+
+        # (要素名, 深度) → パターンによらず内容が決まる（固定の部分木になる）か
+        self._fixed_subtree_cache: Dict[Tuple[str, int], bool] = {}
+        # パスID → そのパスの固定の部分木の雛形（固定でないパスは None）
+        self._subtree_templates: Dict[int, Optional[etree._Element]] = {}
+
+        # Signature要素（ds:SignatureType）に複製して追加する固定の子要素
+        self._signature_template = self._make_signature_template()
+
         # ルート要素を特定
         self.root_elem_name = self._find_root_element()
         if not self.root_elem_name:
             raise ValueError("Could not find root element in XSD")
 
-        # パターンに含まれるオプションパス（初期化）
-        self.optional_paths_in_pattern = set()
+        # ルート要素から到達できない定義を索引から除く
+        self._prune_unreachable_definitions()
 
-    def build_xml(self, pattern: TestPattern) -> etree.Element:
+    def build_xml(self, pattern: TestPattern) -> Optional[etree._Element]:
         """
         テストパターンからXMLを構築
 
@@ -87,640 +263,1012 @@ class PairwiseXMLBuilder:
             pattern: テストパターン（オプション項目の有効/無効）
 
         Returns:
-            XMLルート要素
+            XMLルート要素（ルート要素を作成できない場合は None）
         """
-        # パターンを元に、どのパスを含めるかのセットを作成
-        included_paths = {
-            path for path, include in pattern.assignments.items() if include
-        }
+        assignments = pattern.assignments
 
+        # パターンを元に、パスIDごとの状態（含める/含めない/パターン外）を作成。
         # パターンに含まれていないパスは必須として扱う
         # （大規模スキーマでサンプリングされた場合の対応）
-        self.optional_paths_in_pattern = set(pattern.assignments.keys())
-
-        # ルート要素を構築
-        root_elem = self._build_element_with_pattern(
-            elem_name=self.root_elem_name,
-            current_path=f"/{self.root_elem_name}",
-            current_depth=1,
-            included_paths=included_paths
+        path_states = self._path_states(assignments)
+
+        # ルート要素を作成（名前空間はルートでまとめて宣言し、子孫はそれを引き継ぐ）
+        root_elem = self._create_element(
+            self.root_elem_name, 1, nsmap=self.namespace_map or None
         )
+        if root_elem is None:
+            return None
+
+        root_path_id = self._path_id(f"/{self.root_elem_name}")
+        self._build_subtree(root_elem, self.root_elem_name, root_path_id, 1, path_states)
 
         return root_elem
 
-    def _build_element_with_pattern(
+    def build_xml_bytes(self, pattern: TestPattern, pretty_print: bool = True) -> Optional[bytes]:
+        """
+        テストパターンからXMLを構築し、XML宣言付きのUTF-8バイト列として返す
+
+        ファイルへ書き出す用途では、文字列へのデコード・再エンコードを経ずに
+        このバイト列をそのまま書き込める。
+
+        Args:
+            pattern: テストパターン（オプション項目の有効/無効）
+            pretty_print: インデントして出力するか
+
+        Returns:
+            XMLのバイト列（ルート要素を作成できない場合は None）
+        """
+        root_elem = self.build_xml(pattern)
+        if root_elem is None:
+            return None
+        return etree.tostring(
+            root_elem,
+            pretty_print=pretty_print,
+            xml_declaration=True,
+            encoding='utf-8'
+        )
+
+    def _build_subtree(
         self,
+        elem: etree._Element,
         elem_name: str,
-        current_path: str,
+        path_id: int,
         current_depth: int,
-        included_paths: Set[str]
-    ) -> Optional[etree.Element]:
+        path_states: bytearray
+    ) -> None:
+        """_create_element で作成した要素の内容を、子孫まですべて構築"""
+        # 内容が未構築の要素 (要素, 要素名, パスID, 深度) のスタック
+        # 子要素は親の内容の構築中に親へ追加されるので、処理順は出力に影響しない
+        pending = [(elem, elem_name, path_id, current_depth)]
+        while pending:
+            elem, elem_name, path_id, current_depth = pending.pop()
+            self._build_element_with_pattern(
+                elem,
+                elem_name,
+                path_id,
+                current_depth,
+                path_states,
+                pending
+            )
+
+    def _create_child_element(
+        self,
+        parent_elem: etree._Element,
+        child_name: str,
+        child_path_id: int,
+        child_depth: int,
+        path_states: bytearray,
+        pending: List[Tuple[etree._Element, str, int, int]]
+    ) -> Optional[etree._Element]:
         """
-        パターンに従って要素を構築
+        子要素を作成して親要素に追加
+
+        内容がパターンによらない（固定の部分木になる）パスは、初回に構築した
+        部分木を雛形として保持し、以降は雛形の複製を追加する。
+        それ以外は要素だけを作成し、内容の構築を pending に積む。
+
+        Returns:
+            lxml Element または None（_create_element が作成できない場合）
+        """
+        template = self._subtree_templates.get(child_path_id, _UNRESOLVED)
+        if template is None:
+            child_elem = self._create_element(child_name, child_depth, parent_elem)
+            if child_elem is not None:
+                pending.append((child_elem, child_name, child_path_id, child_depth))
+            return child_elem
+        if template is not _UNRESOLVED:
+            child_elem = copy.deepcopy(template)
+            parent_elem.append(child_elem)
+            return child_elem
+
+        # このパスを初めて構築する
+        child_elem = self._create_element(child_name, child_depth, parent_elem)
+        if child_elem is None:
+            self._subtree_templates[child_path_id] = None
+        elif self._is_fixed_subtree(child_name, child_depth):
+            self._build_subtree(child_elem, child_name, child_path_id, child_depth, path_states)
+            self._subtree_templates[child_path_id] = copy.deepcopy(child_elem)
+        else:
+            self._subtree_templates[child_path_id] = None
+            pending.append((child_elem, child_name, child_path_id, child_depth))
+        return child_elem
+
+    def _is_fixed_subtree(self, elem_name: str, current_depth: int) -> bool:
+        """
+        要素の内容（子孫を含む）がパターンによらず決まるか
+
+        オプション属性・オプション子要素・choiceを子孫のどこにも持たなければ、
+        どのパターンでも同じ部分木になる。max_depth を超える子要素の
+        最小限の要素もパターンによらない。
+        """
+        key = (elem_name, current_depth)
+        fixed = self._fixed_subtree_cache.get(key)
+        if fixed is not None:
+            return fixed
+
+        fixed = True
+        type_def = self._resolve_element(elem_name)[0]
+        if type_def is not None:
+            for _, _, _, is_required in self._effective_attributes(type_def):
+                if not is_required:
+                    fixed = False
+                    break
+            content_model = self._content_model(type_def)
+            if fixed and content_model.kind == _CONTENT_ELEMENT:
+                for group, is_choice, part in content_model.groups:
+                    if is_choice:
+                        fixed = False
+                        break
+                    for child_name, _, is_required, _ in self._sequence_plan(group)[part]:
+                        if not is_required or (
+                            current_depth < self.max_depth
+                            and not self._is_fixed_subtree(child_name, current_depth + 1)
+                        ):
+                            fixed = False
+                            break
+                    if not fixed:
+                        break
+
+        self._fixed_subtree_cache[key] = fixed
+        return fixed
+
+    def _create_element(
+        self,
+        elem_name: str,
+        current_depth: int,
+        parent_elem: Optional[etree._Element] = None,
+        nsmap: Optional[Dict[str, str]] = None
+    ) -> Optional[etree._Element]:
+        """
+        要素を作成（内容は _build_element_with_pattern で構築する）
 
         Args:
             elem_name: 要素名
-            current_path: 現在のパス
-            current_depth: 現在の深度
-            included_paths: 含めるべきパスの集合
+            current_depth: 要素の深度
+            parent_elem: 親要素（指定した場合はその最後の子要素として作成する）
+            nsmap: 要素で宣言する名前空間（ルート要素のみ指定する）
 
         Returns:
-            lxml Element または None
+            lxml Element または None（最大深度超過・要素名が不正な場合）
         """
         if current_depth > self.max_depth:
             return None
 
-        # 名前空間を考慮して要素を作成
-        # elem_nameが空でないことを確認
-        if not elem_name:
+        tag = self._element_tag_cache.get(elem_name)
+        if tag is None:
+            tag = self._element_tag(elem_name)
+        if not tag:
             return None
+        if parent_elem is None:
+            return etree.Element(tag, nsmap=nsmap)
+        return etree.SubElement(parent_elem, tag)
 
+    def _element_tag(self, elem_name: str) -> str:
+        """
+        要素名から作成する要素のタグ名を解決（要素名ごとにキャッシュ）
+
+        Returns:
+            Clark表記のタグ名。要素名が空・不正で作成できない場合は空文字列
+        """
+        tag = ''
         # 名前空間プレフィックスを除去（refの場合）
-        if ':' in elem_name:
-            elem_name = elem_name.split(':', 1)[1]
+        local_name = elem_name.split(':', 1)[1] if ':' in elem_name else elem_name
+        if local_name:
+            try:
+                # タグ名として正しいかを一度だけ検証する
+                tag = etree.QName(self._tag(local_name)).text
+            except ValueError as e:
+                print(f"Error creating element '{local_name}': {e}")
+        self._element_tag_cache[elem_name] = tag
+        return tag
 
-        if not elem_name:  # 再確認
-            return None
+    def _build_element_with_pattern(
+        self,
+        elem: etree._Element,
+        elem_name: str,
+        path_id: int,
+        current_depth: int,
+        path_states: bytearray,
+        pending: List[Tuple[etree._Element, str, int, int]]
+    ) -> None:
+        """
+        パターンに従って要素の属性と内容を構築
 
-        try:
-            qname = etree.QName(self.namespace_map.get('ns', ''), elem_name)
-            elem = etree.Element(qname)
-        except ValueError as e:
-            print(f"Error creating element '{elem_name}': {e}")
-            return None
+        子要素は作成して追加するだけで、その内容は pending に積んで後で構築する。
 
-        # 要素定義を取得
-        elem_def = self._find_element_definition(elem_name)
-        if elem_def is None:
-            # 定義が見つからない場合、デフォルトの要素を返す（空のまま）
-            return elem
-
-        # 型を取得
-        type_name = elem_def.get('type')
-        if type_name is None:
-            # インライン型定義
-            type_def = elem_def.find(f'{self.xsd_prefix}:complexType', namespaces=self.ns)
-            # インラインsimpleTypeもチェック
-            if type_def is None:
-                simple_type_def = elem_def.find(f'{self.xsd_prefix}:simpleType', namespaces=self.ns)
-                if simple_type_def is not None:
-                    # インラインsimpleTypeの場合、テキストを設定
-                    elem.text = self._generate_text_value(elem_name, 'xs:string')
-                    return elem
-        else:
-            # 外部名前空間の型（ds:SignatureTypeなど）はサポートしない
-            if type_name and ':' in type_name and not type_name.startswith('xs:') and not type_name.startswith('xsd:'):
-                # Signature要素の特別処理
-                if elem_name == 'Signature' and type_name == 'ds:SignatureType':
-                    # XML Signatureの最小限の必須構造を追加
-                    ds_ns = 'http://www.w3.org/2000/09/xmldsig#'
-
-                    # SignedInfo要素とその必須子要素
-                    signed_info = etree.Element(etree.QName(ds_ns, 'SignedInfo'))
-
-                    # CanonicalizationMethod（必須）
-                    canon_method = etree.Element(etree.QName(ds_ns, 'CanonicalizationMethod'))
-                    canon_method.set('Algorithm', 'http://www.w3.org/TR/2001/REC-xml-c14n-20010315')
-                    signed_info.append(canon_method)
-
-                    # SignatureMethod（必須）
-                    sig_method = etree.Element(etree.QName(ds_ns, 'SignatureMethod'))
-                    sig_method.set('Algorithm', 'http://www.w3.org/2000/09/xmldsig#rsa-sha1')
-                    signed_info.append(sig_method)
-
-                    # Reference（必須）
-                    reference = etree.Element(etree.QName(ds_ns, 'Reference'))
-                    reference.set('URI', '')
-
-                    # Transforms（必須）
-                    transforms = etree.Element(etree.QName(ds_ns, 'Transforms'))
-                    transform = etree.Element(etree.QName(ds_ns, 'Transform'))
-                    transform.set('Algorithm', 'http://www.w3.org/2000/09/xmldsig#enveloped-signature')
-                    transforms.append(transform)
-                    reference.append(transforms)
-
-                    # DigestMethod（必須）
-                    digest_method = etree.Element(etree.QName(ds_ns, 'DigestMethod'))
-                    digest_method.set('Algorithm', 'http://www.w3.org/2000/09/xmldsig#sha1')
-                    reference.append(digest_method)
-
-                    # DigestValue（必須）
-                    digest_value = etree.Element(etree.QName(ds_ns, 'DigestValue'))
-                    digest_value.text = 'U2FtcGxlRGlnZXN0VmFsdWU='  # Valid base64
-                    reference.append(digest_value)
-
-                    signed_info.append(reference)
-                    elem.append(signed_info)
-
-                    # SignatureValue（必須）
-                    sig_value = etree.Element(etree.QName(ds_ns, 'SignatureValue'))
-                    sig_value.text = 'U2FtcGxlU2lnbmF0dXJlVmFsdWU='  # Valid base64
-                    elem.append(sig_value)
-
-                    return elem
-                # その他の外部名前空間の型は処理できないため、空要素を返す
-                return elem
-
-            type_def = self._find_type_definition(type_name)
+        Args:
+            elem: _create_element で作成した要素
+            elem_name: 要素名
+            path_id: 現在のパスのID
+            current_depth: 現在の深度
+            path_states: パスIDごとのパターン上の状態
+            pending: 内容が未構築の要素のスタック
+        """
+        # 要素名から型定義（またはテキスト等の固定の内容）を解決
+        resolved = self._element_resolution_cache.get(elem_name)
+        if resolved is None:
+            resolved = self._resolve_element(elem_name)
+        type_def, text, is_signature = resolved
 
         if type_def is None:
-            # simpleTypeの場合（型名が指定されているが定義が見つからない）
-            # 型名を使ってテキストを生成
-            if type_name and (type_name.startswith('xs:') or type_name.startswith('xsd:')):
-                elem.text = self._generate_text_value(elem_name, type_name)
-            # 外部名前空間や不明な型の場合は空要素のまま
-            return elem
+            if text is not None:
+                # simpleType: テキストを設定
+                elem.text = text
+            elif is_signature:
+                # XML Signatureの最小限の必須構造をテンプレートから複製
+                elem.extend([copy.deepcopy(child) for child in self._signature_template])
+            # 定義が見つからない・外部名前空間や不明な型の場合は空要素のまま
+            return
 
         # 属性を追加（パターンに従って）- 必須属性を含む
         self._add_attributes_with_pattern(
             elem,
             type_def,
-            current_path,
-            included_paths
+            path_id,
+            path_states
         )
 
-        # complexTypeの内容モデルを詳細にチェック
-        # 直接の子要素をチェック（深い階層は見ない）
-        has_sequence = type_def.find(f'{self.xsd_prefix}:sequence', namespaces=self.ns) is not None
-        has_choice = type_def.find(f'{self.xsd_prefix}:choice', namespaces=self.ns) is not None
-        has_all = type_def.find(f'{self.xsd_prefix}:all', namespaces=self.ns) is not None
-        has_simple_content = type_def.find(f'{self.xsd_prefix}:simpleContent', namespaces=self.ns) is not None
-        has_complex_content = type_def.find(f'{self.xsd_prefix}:complexContent', namespaces=self.ns) is not None
-
-        # complexContent/extensionの中も確認
-        if has_complex_content:
-            extension = type_def.find(f'.//{self.xsd_prefix}:extension', namespaces=self.ns)
-            if extension is not None:
-                has_sequence = has_sequence or extension.find(f'{self.xsd_prefix}:sequence', namespaces=self.ns) is not None
-                has_choice = has_choice or extension.find(f'{self.xsd_prefix}:choice', namespaces=self.ns) is not None
-                has_all = has_all or extension.find(f'{self.xsd_prefix}:all', namespaces=self.ns) is not None
+        # complexTypeの内容モデル（型定義ごとにキャッシュ）
+        content_model = self._content_model(type_def)
 
-        # コンテンツモデルに基づいて処理
-        if has_sequence or has_choice or has_all:
+        # コンテンツモデルの種類に基づいて処理
+        kind = content_model.kind
+        if kind == _CONTENT_ELEMENT:
             # element-only content: 子要素を追加
             self._add_child_elements_with_pattern(
                 elem,
                 type_def,
-                current_path,
+                path_id,
                 current_depth,
-                included_paths
+                path_states,
+                pending
             )
-        elif has_simple_content:
-            # simpleContent: テキスト値を設定
-            # simpleContentの基底型を確認
-            extension = type_def.find(f'.//{self.xsd_prefix}:simpleContent/{self.xsd_prefix}:extension', namespaces=self.ns)
-            if extension is not None:
-                base_type = extension.get('base', 'xs:string')
-                elem.text = self._generate_text_value(elem_name, base_type)
+        elif kind == _CONTENT_SIMPLE:
+            # simpleContent: 基底型に従ってテキスト値を設定
+            if ':' in elem_name:
+                elem_name = elem_name.split(':', 1)[1]
+            elem.text = self._generate_text_value(elem_name, content_model.simple_base)
+        # _CONTENT_EMPTY（属性のみ、子要素のないcomplexContent）は内容なし
+
+    def _resolve_element(
+        self,
+        elem_name: str
+    ) -> Tuple[Optional[etree._Element], Optional[str], bool]:
+        """
+        要素名から内容の作り方を解決（要素名ごとにキャッシュ）
+
+        Returns:
+            (complexTypeの型定義, simpleTypeのテキスト値, ds:SignatureTypeか)。
+            型定義がNoneの場合、要素はテキストを持つか、Signatureの構造を持つか、
+            どちらでもなければ空要素になる
+        """
+        local_name = elem_name
+        # 名前空間プレフィックスを除去（refの場合）
+        if ':' in local_name:
+            local_name = local_name.split(':', 1)[1]
+
+        type_def = None
+        text = None
+        is_signature = False
+
+        # 要素定義を取得（見つからない場合は空要素）
+        elem_def = self._find_element_definition(local_name)
+        if elem_def is not None:
+            # 型を取得
+            type_name = elem_def.get('type')
+            if type_name is None:
+                # インライン型定義
+                type_def = elem_def.find(_XSD_COMPLEX_TYPE)
+                # インラインsimpleTypeもチェック
+                if type_def is None and elem_def.find(_XSD_SIMPLE_TYPE) is not None:
+                    text = self._generate_text_value(local_name, 'xs:string')
+            elif ':' in type_name and not type_name.startswith('xs:') and not type_name.startswith('xsd:'):
+                # 外部名前空間の型（ds:SignatureTypeなど）はサポートしない。
+                # Signature要素だけは最小限の必須構造を持たせる
+                is_signature = local_name == 'Signature' and type_name == 'ds:SignatureType'
             else:
-                elem.text = self._generate_text_value(elem_name, 'xs:string')
-        elif has_complex_content:
-            # complexContent with no child elements = empty content
-            # Do nothing (no text)
-            pass
-        else:
-            # No content model elements = empty content (attributes only)
-            # Do nothing (no text)
-            pass
+                type_def = self._find_type_definition(type_name)
+                if type_def is None and (type_name.startswith('xs:') or type_name.startswith('xsd:')):
+                    # simpleTypeの場合（型名が指定されているが定義が見つからない）
+                    # 型名を使ってテキストを生成
+                    text = self._generate_text_value(local_name, type_name)
 
-        return elem
+        resolved = (type_def, text, is_signature)
+        self._element_resolution_cache[elem_name] = resolved
+        return resolved
 
     def _add_required_children_minimal(
         self,
-        parent_elem: etree.Element,
-        type_def: etree.Element,
+        parent_elem: etree._Element,
+        type_def: etree._Element,
         recursion_level: int = 0
-    ):
+    ) -> None:
         """必須子要素のみを追加（max_depth時の最小限処理）"""
         # 深すぎる再帰を防ぐ
         if recursion_level > 2:
             return
 
-        # sequence内の必須要素を探す
-        for sequence in type_def.findall(f'.//{self.xsd_prefix}:sequence', namespaces=self.ns):
-            for child_elem_def in sequence.findall(f'{self.xsd_prefix}:element', namespaces=self.ns):
-                min_occurs = int(child_elem_def.get('minOccurs', '1'))
-                if min_occurs >= 1:
-                    # 必須要素を追加
-                    child_name = child_elem_def.get('name') or child_elem_def.get('ref')
-                    if not child_name:
-                        continue
-
-                    # Signature要素は複雑なXML Digital Signature構造なのでスキップ
-                    if child_name == 'Signature' or child_name.endswith(':Signature'):
-                        continue
-
-                    # refの場合、名前空間プレフィックスを除去
-                    if ':' in child_name:
-                        child_name = child_name.split(':', 1)[1]
-
-                    ns = self.namespace_map.get('ns', '')
-                    qname = etree.QName(ns, child_name)
-                    child_elem = etree.Element(qname)
-
-                    # 子要素の型を確認
-                    child_elem_definition = self._find_element_definition(child_name)
-                    if child_elem_definition is not None:
-                        child_type_name = child_elem_definition.get('type')
-                        if child_type_name:
-                            if not child_type_name.startswith('xs:') and not child_type_name.startswith('xsd:'):
-                                # complexTypeの場合、その必須属性と子要素を追加（再帰レベル制限）
-                                child_type_def = self._find_type_definition(child_type_name)
-                                if child_type_def is not None:
-                                    self._add_required_attributes_only(child_elem, child_type_def)
-                                    if recursion_level < 2:
-                                        self._add_required_children_minimal(child_elem, child_type_def, recursion_level + 1)
-                            else:
-                                # simpleTypeの場合、テキストを設定
-                                child_elem.text = self._generate_text_value(child_name, child_type_name)
-
-                    parent_elem.append(child_elem)
+        # 型定義直下のsequence内の必須要素を探す
+        # （extension内のsequenceは下で処理する。子孫全体を探すと
+        #   extensionの分が重複し、入れ子のローカル型の子要素も拾ってしまう）
+        for sequence in type_def.findall(_XSD_SEQUENCE):
+            for child_name, _, is_required, _ in self._sequence_plan(sequence):
+                # Signature要素は複雑なXML Digital Signature構造なのでスキップ
+                if is_required and child_name != 'Signature':
+                    self._create_required_child_minimal(parent_elem, child_name, recursion_level)
 
         # complexContent/extensionの場合、基底型の必須要素も処理
-        extension = type_def.find(f'.//{self.xsd_prefix}:extension', namespaces=self.ns)
+        extension = _find_extension(type_def)
         if extension is not None:
             # extensionの中のsequence
-            for sequence in extension.findall(f'{self.xsd_prefix}:sequence', namespaces=self.ns):
-                for child_elem_def in sequence.findall(f'{self.xsd_prefix}:element', namespaces=self.ns):
-                    min_occurs = int(child_elem_def.get('minOccurs', '1'))
-                    if min_occurs >= 1:
-                        child_name = child_elem_def.get('name') or child_elem_def.get('ref')
-                        if not child_name:
-                            continue
-
-                        if ':' in child_name:
-                            child_name = child_name.split(':', 1)[1]
-
-                        ns = self.namespace_map.get('ns', '')
-                        qname = etree.QName(ns, child_name)
-                        child_elem = etree.Element(qname)
-
-                        # 子要素の型を確認して適切な内容を設定
-                        child_elem_definition = self._find_element_definition(child_name)
-                        if child_elem_definition is not None:
-                            child_type_name = child_elem_definition.get('type')
-                            if child_type_name:
-                                if not child_type_name.startswith('xs:') and not child_type_name.startswith('xsd:'):
-                                    child_type_def = self._find_type_definition(child_type_name)
-                                    if child_type_def is not None:
-                                        self._add_required_attributes_only(child_elem, child_type_def)
-                                        if recursion_level < 2:
-                                            self._add_required_children_minimal(child_elem, child_type_def, recursion_level + 1)
-                                else:
-                                    child_elem.text = self._generate_text_value(child_name, child_type_name)
-
-                        parent_elem.append(child_elem)
+            for sequence in extension.findall(_XSD_SEQUENCE):
+                for child_name, _, is_required, _ in self._sequence_plan(sequence):
+                    if is_required:
+                        self._create_required_child_minimal(parent_elem, child_name, recursion_level)
+
+    def _create_required_child_minimal(
+        self,
+        parent_elem: etree._Element,
+        child_name: str,
+        recursion_level: int
+    ) -> etree._Element:
+        """必須子要素を1つ親要素に追加し、型に応じて必須属性・必須子要素・テキストを設定"""
+        child_elem = etree.SubElement(parent_elem, self._tag(child_name))
+
+        # 子要素の型を確認して適切な内容を設定
+        child_elem_definition = self._find_element_definition(child_name)
+        if child_elem_definition is not None:
+            child_type_name = child_elem_definition.get('type')
+            if child_type_name:
+                if not child_type_name.startswith('xs:') and not child_type_name.startswith('xsd:'):
+                    # complexTypeの場合、その必須属性と子要素を追加（再帰レベル制限）
+                    child_type_def = self._find_type_definition(child_type_name)
+                    if child_type_def is not None:
+                        self._add_required_attributes_only(child_elem, child_type_def)
+                        if recursion_level < 2:
+                            self._add_required_children_minimal(child_elem, child_type_def, recursion_level + 1)
+                else:
+                    # simpleTypeの場合、テキストを設定
+                    child_elem.text = self._generate_text_value(child_name, child_type_name)
+
+        return child_elem
 
     def _add_required_attributes_only(
         self,
-        elem: etree.Element,
-        type_def: etree.Element
-    ):
+        elem: etree._Element,
+        type_def: etree._Element
+    ) -> None:
         """必須属性のみを追加（max_depth時の簡易処理）"""
-        # 直接の属性定義を取得
-        for attr in type_def.findall(f'{self.xsd_prefix}:attribute', namespaces=self.ns):
-            attr_use = attr.get('use', 'optional')
-            if attr_use == 'required':
-                attr_name = attr.get('name')
-                if attr_name:
-                    attr_type = attr.get('type', 'xs:string')
-                    dummy_value = self._generate_dummy_value(attr_name, attr_type)
-                    elem.set(attr_name, dummy_value)
-
-        # complexContent/extension からの属性も取得
-        extension = type_def.find(f'.//{self.xsd_prefix}:extension', namespaces=self.ns)
-        if extension is not None:
-            # extensionの属性
-            for attr in extension.findall(f'{self.xsd_prefix}:attribute', namespaces=self.ns):
-                attr_use = attr.get('use', 'optional')
-                if attr_use == 'required':
-                    attr_name = attr.get('name')
-                    if attr_name:
-                        attr_type = attr.get('type', 'xs:string')
-                        dummy_value = self._generate_dummy_value(attr_name, attr_type)
-                        elem.set(attr_name, dummy_value)
-
-            # 基底型の必須属性も再帰的に追加
-            base_type = extension.get('base')
-            if base_type and not base_type.startswith('xs:'):
-                base_type_def = self._find_type_definition(base_type)
-                if base_type_def is not None:
-                    self._add_required_attributes_only(elem, base_type_def)
-
-        # simpleContent/extension からの属性も取得
-        simple_extension = type_def.find(f'.//{self.xsd_prefix}:simpleContent/{self.xsd_prefix}:extension', namespaces=self.ns)
-        if simple_extension is not None:
-            for attr in simple_extension.findall(f'{self.xsd_prefix}:attribute', namespaces=self.ns):
-                attr_use = attr.get('use', 'optional')
-                if attr_use == 'required':
-                    attr_name = attr.get('name')
-                    if attr_name:
-                        attr_type = attr.get('type', 'xs:string')
-                        dummy_value = self._generate_dummy_value(attr_name, attr_type)
-                        elem.set(attr_name, dummy_value)
+        for attr_name, _, attr_value, is_required in self._effective_attributes(type_def, base_first=False):
+            if is_required:
+                elem.set(attr_name, attr_value)
 
     def _add_attributes_with_pattern(
         self,
-        elem: etree.Element,
-        type_def: etree.Element,
-        element_path: str,
-        included_paths: Set[str]
-    ):
+        elem: etree._Element,
+        type_def: etree._Element,
+        path_id: int,
+        path_states: bytearray
+    ) -> None:
         """パターンに従って属性を追加（必須属性も含む）"""
-        # 直接定義されている属性
-        attrs_to_add = []
+        attributes = self._effective_attributes(type_def)
+        attr_path_ids = self._child_path_id_cache.get((path_id, type_def))
+        if attr_path_ids is None:
+            attr_path_ids = self._register_child_paths(path_id, type_def, attributes, path_states)
+
+        set_attribute = elem.set
+        for (attr_name, _, attr_value, is_required), attr_path_id in zip(attributes, attr_path_ids):
+            # 以下の場合に属性を追加（パターンでFalseのものだけ除く）:
+            # 1. 必須属性（use='required'）
+            # 2. パターンに含まれていない（サンプリングで除外された）
+            # 3. パターンでTrueと指定されている
+            if is_required or path_states[attr_path_id] != _PATH_EXCLUDED:
+                # ダミー値を設定
+                set_attribute(attr_name, attr_value)
 
-        # 直接の属性定義を取得
-        for attr in type_def.findall(f'{self.xsd_prefix}:attribute', namespaces=self.ns):
-            attrs_to_add.append(attr)
+    def _effective_attributes(
+        self,
+        type_def: etree._Element,
+        base_first: bool = True
+    ) -> List[Tuple[str, str, str, bool]]:
+        """
+        基底型から継承した分も含め、型の属性宣言を平坦なリストで取得
 
-        # complexContent/extension からの属性も取得
-        extension = type_def.find(f'.//{self.xsd_prefix}:extension', namespaces=self.ns)
-        if extension is not None:
-            # extensionの属性
-            for attr in extension.findall(f'{self.xsd_prefix}:attribute', namespaces=self.ns):
-                attrs_to_add.append(attr)
+        extension/@base をたどる基底型の連鎖を1回だけ解決し、型定義ごとにキャッシュする。
 
-            # 基底型の属性も再帰的に追加
-            base_type = extension.get('base')
-            if base_type and not base_type.startswith('xs:'):
-                base_type_def = self._find_type_definition(base_type)
-                if base_type_def is not None:
-                    # 基底型の属性も追加
-                    self._add_attributes_with_pattern(
-                        elem,
-                        base_type_def,
-                        element_path,
-                        included_paths
-                    )
-
-        # simpleContent/extension からの属性も取得
-        simple_extension = type_def.find(f'.//{self.xsd_prefix}:simpleContent/{self.xsd_prefix}:extension', namespaces=self.ns)
-        if simple_extension is not None:
-            for attr in simple_extension.findall(f'{self.xsd_prefix}:attribute', namespaces=self.ns):
-                attrs_to_add.append(attr)
-
-        # 属性を処理
-        for attr in attrs_to_add:
-            attr_name = attr.get('name')
-            if attr_name is None:
-                continue
+        Args:
+            type_def: 型定義
+            base_first: Trueなら基底型の属性を先に並べる（Falseなら派生型が先）
 
-            attr_path = f"{element_path}@{attr_name}"
-            attr_use = attr.get('use', 'optional')
+        Returns:
+            (属性名, パス接尾辞 "@属性名", 設定するダミー値, 必須か) のリスト
+        """
+        cache_key = (type_def, base_first)
+        attributes = self._attribute_cache.get(cache_key)
+        if attributes is not None:
+            return attributes
+
+        # 基底型の連鎖（派生型 → 基底型の順）
+        chain = []
+        current = type_def
+        while current is not None and current not in chain:
+            chain.append(current)
+            extension = _find_extension(current)
+            base_type = extension.get('base') if extension is not None else None
+            if not base_type or base_type.startswith('xs:'):
+                break
+            current = self._find_type_definition(base_type)
 
-            # パターンに含まれていない属性は必須として扱う
-            is_in_pattern = attr_path in self.optional_paths_in_pattern
-            is_included_in_pattern = attr_path in included_paths
+        if base_first:
+            chain.reverse()
 
-            # 以下の場合に属性を追加:
-            # 1. 必須属性（use='required'）
-            # 2. パターンに含まれていない（サンプリングで除外された）
-            # 3. パターンでTrueと指定されている
-            if attr_use == 'required' or not is_in_pattern or is_included_in_pattern:
-                # ダミー値を設定
-                attr_type = attr.get('type', 'xs:string')
-                dummy_value = self._generate_dummy_value(attr_name, attr_type)
-                elem.set(attr_name, dummy_value)
+        attributes = []
+        for current in chain:
+            # 直接の属性定義
+            attr_defs = current.findall(_XSD_ATTRIBUTE)
+            # complexContent/extension, simpleContent/extension の属性
+            extension = _find_extension(current)
+            if extension is not None:
+                attr_defs.extend(extension.findall(_XSD_ATTRIBUTE))
+            for attr in attr_defs:
+                attr_name = attr.get('name')
+                if attr_name:
+                    attributes.append((
+                        attr_name,
+                        '@' + attr_name,
+                        self._generate_dummy_value(attr_name, attr.get('type', 'xs:string')),
+                        attr.get('use', 'optional') == 'required'
+                    ))
+
+        self._attribute_cache[cache_key] = attributes
+        return attributes
 
     def _add_child_elements_with_pattern(
         self,
-        parent_elem: etree.Element,
-        type_def: etree.Element,
-        parent_path: str,
+        parent_elem: etree._Element,
+        type_def: etree._Element,
+        parent_path_id: int,
         current_depth: int,
-        included_paths: Set[str]
-    ):
+        path_states: bytearray,
+        pending: List[Tuple[etree._Element, str, int, int]]
+    ) -> None:
         """パターンに従って子要素を追加"""
-        # sequence要素を探す
-        sequence = type_def.find(f'.//{self.xsd_prefix}:sequence', namespaces=self.ns)
-        if sequence is not None:
-            self._process_sequence_with_pattern(
-                parent_elem,
-                sequence,
-                parent_path,
-                current_depth,
-                included_paths
-            )
-
-        # choice要素を探す
-        choice = type_def.find(f'.//{self.xsd_prefix}:choice', namespaces=self.ns)
-        if choice is not None:
-            self._process_choice_with_pattern(
-                parent_elem,
-                choice,
-                parent_path,
-                current_depth,
-                included_paths
-            )
-
-        # complexContent/extensionの場合
-        extension = type_def.find(f'.//{self.xsd_prefix}:extension', namespaces=self.ns)
-        if extension is not None:
-            # 基底型の処理
-            base_type = extension.get('base')
-            if base_type:
-                base_type_def = self._find_type_definition(base_type)
-                if base_type_def is not None:
-                    self._add_child_elements_with_pattern(
-                        parent_elem,
-                        base_type_def,
-                        parent_path,
-                        current_depth,
-                        included_paths
-                    )
-
-            # extensionの中のsequence/choice
-            seq = extension.find(f'{self.xsd_prefix}:sequence', namespaces=self.ns)
-            if seq is not None:
-                self._process_sequence_with_pattern(
+        # 基底型の分も含めたsequence/choiceを文書順に処理
+        for group, is_choice, part in self._content_model(type_def).groups:
+            if is_choice:
+                self._process_choice_with_pattern(
                     parent_elem,
-                    seq,
-                    parent_path,
+                    group,
+                    parent_path_id,
                     current_depth,
-                    included_paths
+                    path_states,
+                    pending
                 )
-
-            ch = extension.find(f'{self.xsd_prefix}:choice', namespaces=self.ns)
-            if ch is not None:
-                self._process_choice_with_pattern(
+            else:
+                self._process_sequence_with_pattern(
                     parent_elem,
-                    ch,
-                    parent_path,
+                    group,
+                    part,
+                    parent_path_id,
                     current_depth,
-                    included_paths
+                    path_states,
+                    pending
                 )
 
     def _process_sequence_with_pattern(
         self,
-        parent_elem: etree.Element,
-        sequence: etree.Element,
-        parent_path: str,
+        parent_elem: etree._Element,
+        sequence: etree._Element,
+        part: slice,
+        parent_path_id: int,
         current_depth: int,
-        included_paths: Set[str]
-    ):
-        """sequenceの子要素を処理"""
-        for child_elem_def in sequence.findall(f'{self.xsd_prefix}:element', namespaces=self.ns):
-            child_name = child_elem_def.get('name') or child_elem_def.get('ref')
-            if child_name is None:
-                continue
-
-            # refの場合、名前空間も考慮
-            if child_elem_def.get('ref') and ':' in child_name:
-                # 名前空間プレフィックスを処理
-                prefix, local_name = child_name.split(':', 1)
-                # localNameが空でないことを確認
-                if local_name:
-                    child_name = local_name
-
-            child_path = f"{parent_path}/{child_name}"
-            min_occurs = int(child_elem_def.get('minOccurs', '1'))
+        path_states: bytearray,
+        pending: List[Tuple[etree._Element, str, int, int]]
+    ) -> None:
+        """sequenceの子要素のうち part の範囲を処理"""
+        plan = self._sequence_plan(sequence)
+        child_depth = current_depth + 1
+
+        if child_depth > self.max_depth:
+            # 子要素が max_depth を超える場合は通常の要素を作成できないので、
+            # パターンによらず必須要素だけを最小限の要素として追加する
+            for child_name, _, is_required, is_ds_ref in plan[part]:
+                if is_required:
+                    self._add_max_depth_element(parent_elem, child_name, is_ds_ref)
+            return
 
-            # パターンに含まれていないパスは必須として扱う
-            is_in_pattern = child_path in self.optional_paths_in_pattern
-            is_included_in_pattern = child_path in included_paths
+        child_path_ids = self._child_path_id_cache.get((parent_path_id, sequence))
+        if child_path_ids is None:
+            child_path_ids = self._register_child_paths(parent_path_id, sequence, plan, path_states)
 
-            # 以下の場合に要素を追加:
+        create_child_element = self._create_child_element
+        for (child_name, _, is_required, _), child_path_id in zip(plan[part], child_path_ids[part]):
+            # 以下の場合に要素を追加（パターンでFalseのものだけ除く）:
             # 1. 必須要素（minOccurs >= 1）
             # 2. パターンに含まれていない（サンプリングで除外された）
             # 3. パターンでTrueと指定されている
-            if min_occurs >= 1 or not is_in_pattern or is_included_in_pattern:
-                child_elem = self._build_element_with_pattern(
-                    child_name,
-                    child_path,
-                    current_depth + 1,
-                    included_paths
+            if is_required or path_states[child_path_id] != _PATH_EXCLUDED:
+                create_child_element(
+                    parent_elem, child_name, child_path_id, child_depth, path_states, pending
                 )
-                if child_elem is not None:
-                    parent_elem.append(child_elem)
-                elif min_occurs >= 1 and current_depth + 1 > self.max_depth:
-                    # 必須要素だが max_depth に達した場合、最小限の要素を追加
-                    # 名前空間を適切に設定
-                    ns = self.namespace_map.get('ns', '')
-                    if child_elem_def.get('ref') and ':' in child_elem_def.get('ref'):
-                        # refで別の名前空間を参照している可能性
-                        ref = child_elem_def.get('ref')
-                        if ref.startswith('ds:'):
-                            # XML Signature namespace
-                            ns = 'http://www.w3.org/2000/09/xmldsig#'
-
-                    qname = etree.QName(ns, child_name)
-                    simple_elem = etree.Element(qname)
-
-                    # 型を確認して適切な内容と必須属性を設定
-                    elem_def = self._find_element_definition(child_name)
-                    if elem_def is not None:
-                        type_name = elem_def.get('type')
-                        if type_name and not type_name.startswith('xs:'):
-                            # complexTypeの場合 - 必須属性と必須子要素を追加
-                            type_def = self._find_type_definition(type_name)
-                            if type_def is not None:
-                                # 必須属性のみを追加（簡易版）
-                                self._add_required_attributes_only(simple_elem, type_def)
-                                # 必須子要素も追加（1レベルのみ）
-                                self._add_required_children_minimal(simple_elem, type_def)
-                        elif type_name:
-                            # simpleTypeの場合、テキストを設定
-                            simple_elem.text = self._generate_text_value(child_name, type_name)
-                    parent_elem.append(simple_elem)
+
+    def _add_max_depth_element(
+        self,
+        parent_elem: etree._Element,
+        child_name: str,
+        is_ds_ref: bool
+    ) -> None:
+        """必須要素だが max_depth に達した場合に、最小限の要素を追加"""
+        # 名前空間を適切に設定
+        if is_ds_ref:
+            # refでXML Signature名前空間を参照している
+            qname = etree.QName(_DS_NAMESPACE, child_name)
+        else:
+            qname = self._tag(child_name)
+
+        simple_elem = etree.SubElement(parent_elem, qname)
+
+        # 型を確認して適切な内容と必須属性を設定
+        elem_def = self._find_element_definition(child_name)
+        if elem_def is not None:
+            type_name = elem_def.get('type')
+            if type_name and not type_name.startswith('xs:'):
+                # complexTypeの場合 - 必須属性と必須子要素を追加
+                type_def = self._find_type_definition(type_name)
+                if type_def is not None:
+                    # 必須属性のみを追加（簡易版）
+                    self._add_required_attributes_only(simple_elem, type_def)
+                    # 必須子要素も追加（1レベルのみ）
+                    self._add_required_children_minimal(simple_elem, type_def)
+            elif type_name:
+                # simpleTypeの場合、テキストを設定
+                simple_elem.text = self._generate_text_value(child_name, type_name)
 
     def _process_choice_with_pattern(
         self,
-        parent_elem: etree.Element,
-        choice: etree.Element,
-        parent_path: str,
+        parent_elem: etree._Element,
+        choice: etree._Element,
+        parent_path_id: int,
         current_depth: int,
-        included_paths: Set[str]
-    ):
+        path_states: bytearray,
+        pending: List[Tuple[etree._Element, str, int, int]]
+    ) -> None:
         """choiceの子要素を処理（パターンで指定されたものだけ）"""
-        for child_elem_def in choice.findall(f'{self.xsd_prefix}:element', namespaces=self.ns):
-            child_name = child_elem_def.get('name') or child_elem_def.get('ref')
-            if child_name is None:
-                continue
+        child_depth = current_depth + 1
+        if child_depth > self.max_depth:
+            # max_depth を超える選択肢は作成できない
+            return
 
-            child_path = f"{parent_path}/{child_name}"
+        plan = self._choice_plan(choice)
+        child_path_ids = self._child_path_id_cache.get((parent_path_id, choice))
+        if child_path_ids is None:
+            child_path_ids = self._register_child_paths(parent_path_id, choice, plan, path_states)
 
+        for (child_name, _), child_path_id in zip(plan, child_path_ids):
             # パターンに含まれる選択肢のみ追加
-            if child_path in included_paths:
-                child_elem = self._build_element_with_pattern(
-                    child_name,
-                    child_path,
-                    current_depth + 1,
-                    included_paths
+            if path_states[child_path_id] == _PATH_INCLUDED:
+                child_elem = self._create_child_element(
+                    parent_elem, child_name, child_path_id, child_depth, path_states, pending
                 )
                 if child_elem is not None:
-                    parent_elem.append(child_elem)
                     # choiceは1つだけ選択するのでbreak
                     break
 
-    def _find_root_element(self) -> str:
+    def _path_id(self, path: str) -> int:
+        """パス文字列のIDを取得（未登録なら採番する）"""
+        path_id = self._path_ids.get(path)
+        if path_id is None:
+            path_id = len(self._paths)
+            self._path_ids[path] = path_id
+            self._paths.append(path)
+        return path_id
+
+    def _path_states(self, assignments: Dict[str, bool]) -> bytearray:
+        """
+        パターンの割り当てをパスIDを添字とする状態配列に変換
+
+        パターン外のパスは _PATH_NOT_IN_PATTERN。
+        """
+        path_ids = list(map(self._path_ids.get, assignments))
+        if None in path_ids:
+            path_ids = [self._path_id(path) for path in assignments]
+
+        path_states = bytearray(len(self._paths))
+        for path_id, include in zip(path_ids, assignments.values()):
+            path_states[path_id] = _PATH_INCLUDED if include else _PATH_EXCLUDED
+        return path_states
+
+    def _register_child_paths(
+        self,
+        parent_path_id: int,
+        node: etree._Element,
+        plan: list,
+        path_states: bytearray
+    ) -> List[int]:
+        """
+        親パスの下にある子要素・属性のパスIDを採番してキャッシュに登録
+
+        新たに採番したパスがあれば path_states をその分だけ（パターン外として）延ばすので、
+        返したパスIDは常に path_states の添字として使える。
+
+        Args:
+            parent_path_id: 親要素のパスID
+            node: plan の元になった sequence/choice/型定義ノード
+            plan: 各項目の2番目がパス接尾辞（"/名前" または "@名前"）であるリスト
+            path_states: 構築中のパターンの状態配列
+
+        Returns:
+            plan と同じ順序のパスIDのリスト
+        """
+        parent_path = self._paths[parent_path_id]
+        child_path_ids = [self._path_id(parent_path + entry[1]) for entry in plan]
+        self._child_path_id_cache[(parent_path_id, node)] = child_path_ids
+        if len(path_states) < len(self._paths):
+            path_states.extend(bytes(len(self._paths) - len(path_states)))
+        return child_path_ids
+
+    def _sequence_plan(self, sequence: etree._Element) -> List[Tuple[str, str, bool, bool]]:
+        """
+        sequence直下の子要素宣言を解析した結果を取得（sequenceごとにキャッシュ）
+
+        Returns:
+            (子要素名, パス接尾辞 "/子要素名", 必須か（minOccurs >= 1）, ds:名前空間へのrefか) のリスト
+        """
+        plan = self._sequence_plan_cache.get(sequence)
+        if plan is not None:
+            return plan
+
+        plan = []
+        for child_elem_def in sequence.findall(_XSD_ELEMENT):
+            ref = child_elem_def.get('ref')
+            child_name = child_elem_def.get('name') or ref
+            if child_name is None:
+                continue
+
+            # refの場合、名前空間プレフィックスを処理
+            if ref and ':' in child_name:
+                prefix, local_name = child_name.split(':', 1)
+                # localNameが空でないことを確認
+                if local_name:
+                    child_name = local_name
+
+            plan.append((
+                child_name,
+                '/' + child_name,
+                int(child_elem_def.get('minOccurs', '1')) >= 1,
+                bool(ref) and ref.startswith('ds:')
+            ))
+
+        self._sequence_plan_cache[sequence] = plan
+        return plan
+
+    def _choice_plan(self, choice: etree._Element) -> List[Tuple[str, str]]:
+        """
+        choiceの選択肢の (要素名, パス接尾辞 "/要素名") を取得（choiceごとにキャッシュ）
+
+        入れ子のsequence/choiceの中の要素宣言も文書順に選択肢として扱う
+        （OptionalElementExtractor._extract_from_choice と同じ規則）。
+        """
+        plan = self._choice_plan_cache.get(choice)
+        if plan is None:
+            plan = []
+            nodes = list(choice)
+            nodes.reverse()
+            while nodes:
+                node = nodes.pop()
+                tag = node.tag
+                if tag == _XSD_ELEMENT:
+                    child_name = node.get('name') or node.get('ref')
+                    if child_name is not None:
+                        plan.append((child_name, '/' + child_name))
+                elif tag == _XSD_SEQUENCE or tag == _XSD_CHOICE:
+                    nodes.extend(reversed(node))
+            self._choice_plan_cache[choice] = plan
+        return plan
+
+    def _find_root_element(self) -> Optional[str]:
         """ルート要素名を取得"""
-        prefix = self.xsd_prefix
-        root_elems = self.schema_tree.xpath(
-            f'/{prefix}:schema/{prefix}:element',
-            namespaces=self.ns
-        )
-        if root_elems:
-            return root_elems[0].get('name')
+        root = self.schema_tree.getroot()
+        if root.tag != _XSD_SCHEMA:
+            return None
+        root_elem = root.find(_XSD_ELEMENT)
+        if root_elem is not None:
+            return root_elem.get('name')
         return None
 
-    def _find_element_definition(self, elem_name: str) -> Optional[etree.Element]:
-        """要素定義を検索"""
-        elems = self.schema_tree.xpath(
-            f'//{self.xsd_prefix}:element[@name="{elem_name}"]',
-            namespaces=self.ns
-        )
-        return elems[0] if elems else None
+    def _make_signature_template(self) -> List[etree._Element]:
+        """
+        ds:SignatureType の最小限の必須構造（SignedInfo, SignatureValue）を構築
 
-    def _find_type_definition(self, type_name: str) -> Optional[etree.Element]:
-        """型定義を検索"""
-        local_name = type_name.split(':')[-1]
+        内容は常に同じなので初期化時に1回だけ構築し、
+        Signature要素ごとに複製して使う。
+        """
+        # SignedInfo要素とその必須子要素
+        signed_info = etree.Element(_DS_SIGNED_INFO)
+
+        # CanonicalizationMethod（必須）
+        canon_method = etree.Element(_DS_CANONICALIZATION_METHOD)
+        canon_method.set('Algorithm', 'http://www.w3.org/TR/2001/REC-xml-c14n-20010315')
+        signed_info.append(canon_method)
+
+        # SignatureMethod（必須）
+        sig_method = etree.Element(_DS_SIGNATURE_METHOD)
+        sig_method.set('Algorithm', 'http://www.w3.org/2000/09/xmldsig#rsa-sha1')
+        signed_info.append(sig_method)
+
+        # Reference（必須）
+        reference = etree.Element(_DS_REFERENCE)
+        reference.set('URI', '')
+
+        # Transforms（必須）
+        transforms = etree.Element(_DS_TRANSFORMS)
+        transform = etree.Element(_DS_TRANSFORM)
+        transform.set('Algorithm', 'http://www.w3.org/2000/09/xmldsig#enveloped-signature')
+        transforms.append(transform)
+        reference.append(transforms)
+
+        # DigestMethod（必須）
+        digest_method = etree.Element(_DS_DIGEST_METHOD)
+        digest_method.set('Algorithm', 'http://www.w3.org/2000/09/xmldsig#sha1')
+        reference.append(digest_method)
+
+        # DigestValue（必須）
+        digest_value = etree.Element(_DS_DIGEST_VALUE)
+        digest_value.text = 'U2FtcGxlRGlnZXN0VmFsdWU='  # Valid base64
+        reference.append(digest_value)
+
+        signed_info.append(reference)
+
+        # SignatureValue（必須）
+        sig_value = etree.Element(_DS_SIGNATURE_VALUE)
+        sig_value.text = 'U2FtcGxlU2lnbmF0dXJlVmFsdWU='  # Valid base64
+
+        return [signed_info, sig_value]
+
+    def _content_model(self, type_def: etree._Element) -> ContentModel:
+        """型定義の内容モデルを取得（型定義ごとに1回だけ解析する）"""
+        content_model = self._content_model_cache.get(type_def)
+        if content_model is not None:
+            return content_model
+
+        # 直接の子要素を1回だけ走査する（深い階層は見ない。子孫全体を探すと
+        # extension内のsequenceを型直下の分として二重に処理し、子要素の
+        # インライン型のsequence/choiceまで拾ってしまう）
+        sequence = None
+        choice = None
+        has_all = False
+        complex_content = None
+        simple_content = None
+        for child in type_def:
+            tag = child.tag
+            if tag == _XSD_SEQUENCE:
+                if sequence is None:
+                    sequence = child
+            elif tag == _XSD_CHOICE:
+                if choice is None:
+                    choice = child
+            elif tag == _XSD_ALL:
+                has_all = True
+            elif tag == _XSD_COMPLEX_CONTENT:
+                if complex_content is None:
+                    complex_content = child
+            elif tag == _XSD_SIMPLE_CONTENT:
+                if simple_content is None:
+                    simple_content = child
+        has_element_content = sequence is not None or choice is not None or has_all
+
+        # complexContent/extension または simpleContent/extension
+        extension = None
+        if complex_content is not None:
+            extension = complex_content.find(_XSD_EXTENSION)
+        if extension is None and simple_content is not None:
+            extension = simple_content.find(_XSD_EXTENSION)
+
+        extension_sequence = None
+        extension_choice = None
+        if extension is not None:
+            extension_sequence = extension.find(_XSD_SEQUENCE)
+            extension_choice = extension.find(_XSD_CHOICE)
+            # complexContent/extensionの中も確認
+            if complex_content is not None and not has_element_content:
+                has_element_content = (
+                    extension_sequence is not None
+                    or extension_choice is not None
+                    or extension.find(_XSD_ALL) is not None
+                )
 
-        # キャッシュを確認
-        if local_name in self.type_cache:
-            return self.type_cache[local_name]
+        # 内容の種類を判定（子要素 > simpleContent > 空 の優先順）
+        simple_base = 'xs:string'
+        if has_element_content:
+            kind = _CONTENT_ELEMENT
+        elif simple_content is not None:
+            kind = _CONTENT_SIMPLE
+            # simpleContentの基底型を確認
+            simple_extension = simple_content.find(_XSD_EXTENSION)
+            if simple_extension is not None:
+                simple_base = simple_extension.get('base', 'xs:string')
+        else:
+            kind = _CONTENT_EMPTY
 
-        # complexType
-        types = self.schema_tree.xpath(
-            f'//{self.xsd_prefix}:complexType[@name="{local_name}"]',
-            namespaces=self.ns
-        )
-        if types:
-            self.type_cache[local_name] = types[0]
-            return types[0]
-
-        # simpleType
-        types = self.schema_tree.xpath(
-            f'//{self.xsd_prefix}:simpleType[@name="{local_name}"]',
-            namespaces=self.ns
-        )
-        if types:
-            self.type_cache[local_name] = types[0]
-            return types[0]
+        content_model = ContentModel(kind=kind, simple_base=simple_base, groups=[])
+        # 基底型をたどる前に登録しておく（基底型が循環していても止まる）
+        self._content_model_cache[type_def] = content_model
 
-        return None
+        groups = content_model.groups
+        if sequence is not None:
+            self._append_group(sequence, groups)
+        if choice is not None:
+            self._append_group(choice, groups)
+        if extension is not None:
+            # 基底型の子要素を先に、extensionで追加された子要素を後に並べる
+            base_type = extension.get('base')
+            if base_type:
+                base_type_def = self._find_type_definition(base_type)
+                if base_type_def is not None:
+                    groups.extend(self._content_model(base_type_def).groups)
+            if extension_sequence is not None:
+                self._append_group(extension_sequence, groups)
+            if extension_choice is not None:
+                self._append_group(extension_choice, groups)
+
+        return content_model
+
+    def _append_group(
+        self,
+        group: etree._Element,
+        groups: List[Tuple[etree._Element, bool, slice]]
+    ) -> None:
+        """
+        sequence/choiceを ContentModel.groups の形で文書順に追加
+
+        sequenceの中に入れ子のsequence/choiceがあれば、直下の子要素宣言をその前後で
+        範囲に分け、入れ子の分を間に展開する。choiceは入れ子も含めて1つの選択として扱う。
+        """
+        if group.tag == _XSD_CHOICE:
+            groups.append((group, True, slice(None)))
+            return
+
+        # 範囲は _sequence_plan の添字（name/refを持つ子要素宣言の数）で数える
+        start = 0
+        index = 0
+        for child in group:
+            tag = child.tag
+            if tag == _XSD_ELEMENT:
+                if child.get('name') or child.get('ref'):
+                    index += 1
+            elif tag == _XSD_SEQUENCE or tag == _XSD_CHOICE:
+                if index > start:
+                    groups.append((group, False, slice(start, index)))
+                    start = index
+                self._append_group(child, groups)
+        if index > start:
+            groups.append((group, False, slice(start, None)))
+
+    def _tag(self, name: str) -> str:
+        """
+        ターゲット名前空間のClark表記のタグ名を取得（要素名ごとにキャッシュ）
+
+        ターゲット名前空間がなければ要素名そのものを返す。
+        """
+        tag = self._tag_cache.get(name)
+        if tag is None:
+            tag = f'{{{self._target_ns}}}{name}' if self._target_ns else name
+            self._tag_cache[name] = tag
+        return tag
 
-    def _get_enumeration_values(self, type_name: str) -> list:
+    def _index_definitions(self) -> None:
+        """
+        要素定義・型定義を名前で引ける辞書を一度だけ構築
+
+        スキーマを1回走査し、同名の定義は文書順で最初のものを採用する。
+        型定義は complexType を simpleType より優先し、
+        SchemaAnalyzer の型キャッシュ（インポート分を含む）があればそれを優先する。
+        """
+        simple_type_defs: Dict[str, etree._Element] = {}
+        for node in self.schema_tree.iter(
+            _XSD_ELEMENT, _XSD_COMPLEX_TYPE, _XSD_SIMPLE_TYPE
+        ):
+            name = node.get('name')
+            if not name:
+                continue
+            if node.tag == _XSD_ELEMENT:
+                self._element_defs.setdefault(name, node)
+            elif node.tag == _XSD_COMPLEX_TYPE:
+                self._type_defs.setdefault(name, node)
+            else:
+                simple_type_defs.setdefault(name, node)
+
+        for name, node in simple_type_defs.items():
+            self._type_defs.setdefault(name, node)
+        self._type_defs.update(self.type_cache)
+
+    def _prune_unreachable_definitions(self) -> None:
+        """
+        ルート要素から到達できない要素定義・型定義を索引から除く
+
+        構築時の検索は名前単位なので、到達判定も名前単位で行う。
+        到達した定義ノードの子孫に現れる要素名（name/ref）と型名（type/base）を
+        たどって閉包を求める。xs:string は既定の型として常に検索されるため、
+        同名のユーザー定義型があれば残す。
+        """
+        reachable_elements = {self.root_elem_name}
+        reachable_types = {'string'}
+        pending = [
+            self._element_defs.get(self.root_elem_name),
+            self._type_defs.get('string')
+        ]
+
+        while pending:
+            node = pending.pop()
+            if node is None:
+                continue
+
+            for descendant in node.iter(tag=etree.Element):
+                if descendant.tag == _XSD_ELEMENT:
+                    elem_name = descendant.get('name') or descendant.get('ref')
+                    if elem_name:
+                        elem_name = elem_name.split(':')[-1]
+                        if elem_name not in reachable_elements:
+                            reachable_elements.add(elem_name)
+                            pending.append(self._element_defs.get(elem_name))
+
+                for attr_name in ('type', 'base'):
+                    type_name = descendant.get(attr_name)
+                    if type_name:
+                        type_name = type_name.split(':')[-1]
+                        if type_name not in reachable_types:
+                            reachable_types.add(type_name)
+                            pending.append(self._type_defs.get(type_name))
+
+        self._element_defs = {
+            name: node for name, node in self._element_defs.items()
+            if name in reachable_elements
+        }
+        self._type_defs = {
+            name: node for name, node in self._type_defs.items()
+            if name in reachable_types
+        }
+
+    def _find_element_definition(self, elem_name: str) -> Optional[etree._Element]:
+        """要素定義を検索"""
+        return self._element_defs.get(elem_name)
+
+    def _find_type_definition(self, type_name: str) -> Optional[etree._Element]:
+        """型定義を検索"""
+        return self._type_defs.get(type_name.rpartition(':')[2])
+
+    def _get_enumeration_values(self, type_name: str) -> Tuple[str, ...]:
         """
         型定義から列挙値を取得
 
+        型定義の検索はローカル名で行うため、キャッシュもローカル名をキーとし、
+        プレフィックスの違う表記（"my:StatusType" と "StatusType"）で共有する。
+
         Args:
             type_name: 型名（例: "my:StatusType"）
 
         Returns:
-            列挙値のリスト（列挙型でない場合は空リスト）
+            列挙値のタプル（列挙型でない場合は空タプル）
         """
-        type_def = self._find_type_definition(type_name)
-        if type_def is None:
-            return []
+        local_name = type_name.rpartition(':')[2]
+        enumerations = self._enumeration_cache.get(local_name)
+        if enumerations is not None:
+            return enumerations
 
-        # simpleType/restriction/enumeration を探す
-        enumerations = type_def.xpath(
-            f'.//{self.xsd_prefix}:restriction/{self.xsd_prefix}:enumeration/@value',
-            namespaces=self.ns
-        )
+        type_def = self._find_type_definition(local_name)
+        if type_def is None:
+            enumerations = ()
+        else:
+            # simpleType/restriction/enumeration を探す（文書順）
+            enumerations = tuple(
+                enumeration.get('value')
+                for enumeration in type_def.iter(_XSD_ENUMERATION)
+                if enumeration.getparent().tag == _XSD_RESTRICTION
+                and enumeration.get('value') is not None
+            )
 
-        return enumerations if enumerations else []
+        self._enumeration_cache[local_name] = enumerations
+        return enumerations
 
     def _generate_dummy_value(self, name: str, attr_type: str) -> str:
         """
@@ -733,30 +1281,25 @@ class PairwiseXMLBuilder:
         Returns:
             適切なダミー値
         """
+        key = (name, attr_type)
+        value = self._dummy_value_cache.get(key)
+        if value is not None:
+            return value
+
         # 列挙型の場合、定義された値から選択
         enum_values = self._get_enumeration_values(attr_type)
         if enum_values:
             # 最初の値を使用（一貫性のため）
-            return enum_values[0]
-
-        # 型に応じたダミー値
-        type_mapping = {
-            'xs:string': f'{name}_value',
-            'xs:int': '1',
-            'xs:integer': '1',
-            'xs:decimal': '1.0',
-            'xs:float': '1.0',
-            'xs:double': '1.0',
-            'xs:boolean': 'true',
-            'xs:date': '2024-01-01',
-            'xs:dateTime': '2024-01-01T00:00:00',
-            'xs:time': '12:00:00',
-            'xs:base64Binary': 'U2FtcGxlRGF0YQ==',  # "SampleData" in base64
-            'xs:hexBinary': '48656C6C6F',  # "Hello" in hex
-        }
+            value = enum_values[0]
+            self._dummy_value_cache[key] = value
+            return value
 
-        local_type = attr_type.split(':')[-1] if ':' in attr_type else attr_type
-        return type_mapping.get(f'xs:{local_type}', f'{name}_value')
+        # 型に応じたダミー値（xs:string と未知の型は名前から作る）
+        value = _ATTRIBUTE_VALUES_BY_TYPE.get(attr_type.rpartition(':')[2])
+        if value is None:
+            value = f'{name}_value'
+        self._dummy_value_cache[key] = value
+        return value
 
     def _generate_text_value(self, elem_name: str, elem_type: str) -> str:
         """
@@ -769,26 +1312,23 @@ class PairwiseXMLBuilder:
         Returns:
             適切なテキスト値
         """
+        key = (elem_name, elem_type)
+        value = self._text_value_cache.get(key)
+        if value is not None:
+            return value
+
         # 列挙型の場合、定義された値から選択
         enum_values = self._get_enumeration_values(elem_type)
         if enum_values:
-            return enum_values[0]
-
-        # 型に応じたダミー値
-        type_mapping = {
-            'xs:string': f'{elem_name}_value',
-            'xs:int': '1',
-            'xs:integer': '100',
-            'xs:decimal': '1.0',
-            'xs:float': '1.0',
-            'xs:double': '1.0',
-            'xs:boolean': 'true',
-            'xs:date': '2024-01-01',
-            'xs:dateTime': '2024-01-01T00:00:00Z',
-            'xs:time': '12:00:00',
-            'xs:base64Binary': 'U2FtcGxlRGF0YQ==',  # "SampleData" in base64
-            'xs:hexBinary': '48656C6C6F',  # "Hello" in hex
-        }
-
-        local_type = elem_type.split(':')[-1] if ':' in elem_type else elem_type
-        return type_mapping.get(f'xs:{local_type}', 'sample_text')
+            value = enum_values[0]
+            self._text_value_cache[key] = value
+            return value
+
+        # 型に応じたダミー値（xs:string は要素名から作り、未知の型は固定の文字列）
+        local_type = elem_type.rpartition(':')[2]
+        if local_type == 'string':
+            value = f'{elem_name}_value'
+        else:
+            value = _TEXT_VALUES_BY_TYPE.get(local_type, 'sample_text')
+        self._text_value_cache[key] = value
+        return value
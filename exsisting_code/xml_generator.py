@@ -15,38 +15,127 @@ XSDスキーマから高カバレッジのXMLファイル群を自動生成す
 import sys
 import os
 from lxml import etree
-from typing import Set, Dict, List, Tuple, Optional
+from typing import Set, FrozenSet, Dict, List, Tuple, Optional
 from collections import defaultdict
+from dataclasses import dataclass
+from itertools import chain, cycle
 import random
+import copy
+import heapq
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 # xsd_coverage.pyのSchemaAnalyzerを再利用
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from xsd_coverage import SchemaAnalyzer
+from compat import DATACLASS_SLOTS, popcount
+
+# テキストにサンプル値を入れる組み込み型（子要素の型として出てきたら展開しない）
+_SAMPLE_TEXT_TYPES = ('string', 'integer', 'date', 'dateTime',
+                      'boolean', 'decimal', 'float', 'double')
+
+# テキストにID風の値を入れる組み込み型（名前付き型の子要素のみ）
+_ID_TEXT_TYPES = ('ID', 'NCName', 'token')
+
+# 型ごとの固定のサンプル値（ID/NCName/token は XMLGenerator の値プールから取る）
+_SAMPLE_VALUES = {
+    'string': 'SampleText',
+    'integer': '42',
+    'int': '42',
+    'long': '1234567890',
+    'short': '100',
+    'byte': '10',
+    'decimal': '123.45',
+    'float': '123.45',
+    'double': '123.456789',
+    'boolean': 'true',
+    'date': '2025-01-15',
+    'dateTime': '2025-01-15T10:30:00',
+    'time': '10:30:00',
+    'anyURI': 'http://example.com',
+    'base64Binary': 'QmFzZTY0RGF0YQ==',
+    'hexBinary': '48656C6C6F',
+}
+
+# ID風の値のプールの大きさ（使い切ったら先頭から繰り返す）
+_SAMPLE_POOL_SIZE = 200
 
 
 class XMLSnippet:
     """XMLスニペット候補を表すクラス"""
 
-    def __init__(self, root_element: etree._Element, covered_paths: Set[str], depth: int):
+    def __init__(self, root_element: etree._Element, covered_paths: Set[str], depth: int,
+                 mask: int = 0):
         """
         Args:
             root_element: XMLのルート要素（lxml Element）
             covered_paths: このスニペットがカバーする要素パス・属性パスの集合
             depth: このスニペットの最大深度
+            mask: covered_paths のうちカバレッジ項目であるもののビット集合
+                  （ビット位置は XMLGenerator.path_index）
         """
         self.root_element = root_element
         self.covered_paths = covered_paths
         self.depth = depth
+        self.mask = mask
 
     def to_string(self, pretty: bool = True) -> str:
         """XML文字列として出力"""
+        return self.to_bytes(pretty).decode('utf-8')
+
+    def to_bytes(self, pretty: bool = True) -> bytes:
+        """UTF-8のXMLバイト列として出力（ファイルにはこのまま書き込む）"""
         return etree.tostring(
             self.root_element,
             pretty_print=pretty,
             xml_declaration=True,
             encoding='utf-8'
-        ).decode('utf-8')
+        )
+
+
+@dataclass(**DATACLASS_SLOTS)
+class SnippetVariant:
+    """XMLを構築する前のスニペット候補（構築条件とカバー範囲）"""
+    elem_name: str  # ルート要素名
+    elem_type: str  # ルート要素の型名
+    depth: int
+    include_optional: bool
+    choice_index: int
+    mask: int  # カバーするカバレッジ項目のビット集合（XMLGenerator.path_index）
+
+
+@dataclass(**DATACLASS_SLOTS)
+class AttrSpec:
+    """属性宣言から取り出した値"""
+    name: str
+    type_name: str  # 名前空間プレフィックスを除いた型名
+    required: bool  # use="required" か
+    path_suffix: str  # パス接尾辞 "@属性名"
+
+
+@dataclass(**DATACLASS_SLOTS)
+class ElemSpec:
+    """子要素宣言から取り出した値"""
+    name: Optional[str]
+    ref: Optional[str]  # ref先の要素名（名前空間プレフィックスを除いたもの）
+    type_name: Optional[str]  # 名前空間プレフィックスを除いた型名
+    min_occurs: int
+    inline_complex_type: Optional[etree._Element]  # インラインのcomplexType
+    tag: Optional[str]  # 作成する要素のタグ（名前空間付きなら "{URI}要素名"）
+    path_suffix: Optional[str]  # パス接尾辞 "/要素名"
+
+
+@dataclass(**DATACLASS_SLOTS)
+class TypeInfo:
+    """
+    型定義から取り出した、XML構築に使う宣言
+
+    再帰のたびに型定義をXPathでたどり直さないよう、型ごとに1回だけ作る。
+    """
+    attrs: List[AttrSpec]  # 直接定義された属性
+    ext_attrs: List[AttrSpec]  # extension内の属性
+    containers: List[Tuple[List[ElemSpec], bool]]  # sequence/choice/all ごとの (子要素宣言, choiceか)
+    enum_values: Tuple[str, ...]  # 列挙値
 
 
 class XMLGenerator:
@@ -74,6 +163,12 @@ class XMLGenerator:
         self.all_coverage_items: Set[str] = \
             self.defined_element_paths | self.defined_attribute_paths
 
+        # カバレッジ項目 → ビット位置
+        # （スニペットのカバー範囲をビット集合で持ち、セット被覆の計算を整数演算で行う）
+        self.path_index: Dict[str, int] = {
+            path: bit for bit, path in enumerate(sorted(self.all_coverage_items))
+        }
+
         # 名前空間マップ
         self.namespace_map = namespace_map or {}
         if not self.namespace_map:
@@ -93,13 +188,47 @@ class XMLGenerator:
         # 型キャッシュ
         self.type_cache = self.schema_analyzer.type_cache
 
+        # 要素名 → type属性を持つ最初の同名要素宣言（ref解決用。スキーマを1回だけ走査）
+        self.global_element_index: Dict[str, etree._Element] = {}
+        for elem in self.schema_root.iter(f'{{{self.ns["xsd"]}}}element'):
+            name = elem.get('name')
+            if name and elem.get('type') and name not in self.global_element_index:
+                self.global_element_index[name] = elem
+
+        # ID風の値はあらかじめ重複なく引いておき、順に使う（値ごとに乱数を引かない）
+        rng = random.Random(0)
+        self._sample_value_lists: Dict[str, List[str]] = {
+            'ID': [f'ID{n}' for n in rng.sample(range(1000, 10000), _SAMPLE_POOL_SIZE)],
+            'NCName': [f'NCName{n}' for n in rng.sample(range(100, 1000), _SAMPLE_POOL_SIZE)],
+            'token': [f'Token{n}' for n in rng.sample(range(100, 1000), _SAMPLE_POOL_SIZE)],
+        }
+        self._reset_sample_values()
+
+        # 型名 → 型定義から取り出した宣言（_get_type_info で必要になった型だけ作る）
+        self.type_index: Dict[str, TypeInfo] = {}
+        # インラインのcomplexType → 取り出した宣言
+        self._inline_type_index: Dict[etree._Element, TypeInfo] = {}
+
+        # (型名, 残り深度, include_optional, choice_index) → 構築で追加される相対パス
+        self._relative_paths_cache: Dict[Tuple[str, int, bool, int], FrozenSet[str]] = {}
+        # (インラインのcomplexType, 残り深度, include_optional, choice_index) → 同上
+        self._inline_relative_paths_cache: Dict[Tuple[etree._Element, int, bool, int], FrozenSet[str]] = {}
+
+        # (タグ, 型名, 残り深度, include_optional, choice_index) → 構築済みの子要素（テンプレート）
+        # 乱数・値プールから値を取らずに構築できた（常に同じ内容になる）部分木だけを入れる
+        self._subtree_cache: Dict[Tuple[str, str, int, bool, int], etree._Element] = {}
+        # 乱数・値プールから取った値の数（部分木の内容が固定かどうかの判定に使う）
+        self._drawn_value_count = 0
+
     def generate_snippets(self, max_snippets: int = 100,
-                         max_gen_depth: Optional[int] = None) -> List[XMLSnippet]:
+                         max_gen_depth: Optional[int] = None,
+                         workers: int = 1) -> List[XMLSnippet]:
         """XMLスニペット候補を生成
 
         Args:
             max_snippets: 生成する最大スニペット数
             max_gen_depth: 生成時の最大深度（Noneの場合はmax_depthを使用）
+            workers: XML構築の並列プロセス数（1なら並列化しない）
 
         Returns:
             XMLSnippet候補のリスト
@@ -107,7 +236,8 @@ class XMLGenerator:
         if max_gen_depth is None:
             max_gen_depth = min(self.max_depth, 5)  # 実用的な制限
 
-        snippets = []
+        # 各バリエーションのカバー範囲を先に（XMLを作らずに）求める
+        variants: List[SnippetVariant] = []
 
         # ルート要素を取得
         root_elements = self.schema_root.findall('.//xsd:element[@name]', self.ns)
@@ -123,38 +253,195 @@ class XMLGenerator:
                     for target_depth in range(1, max_gen_depth + 1):
                         # 各深度で複数のバリエーションを生成
                         # バリエーション1: 全ての要素・属性を含める（最大カバレッジ）
-                        snippet = self._generate_snippet_for_depth(
+                        variants.append(self._make_variant(
                             elem_name, elem_type, target_depth,
                             include_optional=True, choice_index=0
-                        )
-                        if snippet:
-                            snippets.append(snippet)
+                        ))
 
                         # バリエーション2: 必須要素のみ（最小構成）
-                        snippet = self._generate_snippet_for_depth(
+                        variants.append(self._make_variant(
                             elem_name, elem_type, target_depth,
                             include_optional=False, choice_index=0
-                        )
-                        if snippet:
-                            snippets.append(snippet)
+                        ))
 
                         # バリエーション3〜: choice要素で異なる選択肢
                         for choice_idx in range(1, 3):  # choice要素の異なる選択肢
-                            snippet = self._generate_snippet_for_depth(
+                            variants.append(self._make_variant(
                                 elem_name, elem_type, target_depth,
                                 include_optional=True, choice_index=choice_idx
-                            )
-                            if snippet:
-                                snippets.append(snippet)
+                            ))
 
-                        if len(snippets) >= max_snippets:
+                        if len(variants) >= max_snippets:
                             break
 
-            if len(snippets) >= max_snippets:
+            if len(variants) >= max_snippets:
                 break
 
+        # セット被覆で選ばれることのないバリエーションを除き、残したものだけXMLを構築
+        variants = self._remove_redundant_snippets(variants)
+
+        if min(workers, len(variants)) > 1:
+            # バリエーションは互いに独立なので、ワーカープロセスで並列に構築する
+            # （lxmlの要素はプロセス間で受け渡せないので、シリアライズして受け取る）
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(variants)),
+                initializer=_init_worker,
+                initargs=(self.xsd_path, self.max_depth, self.namespace_map)
+            ) as executor:
+                results = list(executor.map(_build_snippet_in_worker, variants))
+
+            return [
+                XMLSnippet(etree.fromstring(xml_bytes), covered_paths, variant.depth, variant.mask)
+                for variant, (xml_bytes, covered_paths) in zip(variants, results)
+            ]
+
+        snippets = []
+        for variant in variants:
+            snippets.append(self._generate_snippet_for_depth(
+                variant.elem_name, variant.elem_type, variant.depth,
+                include_optional=variant.include_optional,
+                choice_index=variant.choice_index
+            ))
         return snippets
 
+    def _make_variant(self, elem_name: str, elem_type: str, target_depth: int,
+                      include_optional: bool = True, choice_index: int = 0) -> SnippetVariant:
+        """スニペットのバリエーションを、XMLを構築せずにカバー範囲だけ求めて作成"""
+        # _generate_snippet_for_depth と同じく、ルートは深度1
+        root_path = f"/{elem_name}"
+        relative_paths = self._relative_paths(
+            self.schema_analyzer._remove_ns_prefix(elem_type),
+            target_depth - 1, include_optional, choice_index
+        )
+        covered_paths = {root_path + path for path in relative_paths}
+        covered_paths.add(root_path)
+
+        return SnippetVariant(elem_name, elem_type, target_depth, include_optional,
+                              choice_index, self._paths_to_mask(covered_paths))
+
+    def _relative_paths(self, type_name: str, remaining_depth: int,
+                        include_optional: bool, choice_index: int) -> FrozenSet[str]:
+        """型の要素の下に _build_element が追加するパスを、要素自身のパスからの相対パスで求める
+
+        構築条件が同じなら結果も同じなので、バリエーション間・深度間で共有する。
+
+        Args:
+            type_name: 名前空間プレフィックスを除いた型名
+            remaining_depth: 残り深度（max_depth - current_depth）
+            include_optional: オプショナル要素・属性を含めるか
+            choice_index: choice要素の選択インデックス
+
+        Returns:
+            "/子要素名/..." や "@属性名" 形式の相対パスの集合
+        """
+        key = (type_name, remaining_depth, include_optional, choice_index)
+        paths = self._relative_paths_cache.get(key)
+        if paths is None:
+            type_info = self._get_type_info(type_name) if remaining_depth >= 0 else None
+            if type_info is None:
+                paths = frozenset()
+            else:
+                paths = self._collect_relative_paths(type_info, False, remaining_depth,
+                                                     include_optional, choice_index)
+            self._relative_paths_cache[key] = paths
+        return paths
+
+    def _inline_relative_paths(self, type_elem: etree._Element, remaining_depth: int,
+                               include_optional: bool, choice_index: int) -> FrozenSet[str]:
+        """インライン型の要素の下に _build_inline_type が追加する相対パスを求める"""
+        key = (type_elem, remaining_depth, include_optional, choice_index)
+        paths = self._inline_relative_paths_cache.get(key)
+        if paths is None:
+            if remaining_depth < 0:
+                paths = frozenset()
+            else:
+                paths = self._collect_relative_paths(self._get_inline_type_info(type_elem), True,
+                                                     remaining_depth, include_optional, choice_index)
+            self._inline_relative_paths_cache[key] = paths
+        return paths
+
+    def _collect_relative_paths(self, type_info: TypeInfo, inline: bool, remaining_depth: int,
+                                include_optional: bool, choice_index: int) -> FrozenSet[str]:
+        """_build_element / _build_inline_type と同じ規則で宣言をたどり、追加される相対パスを集める"""
+        paths = set()
+
+        # 属性（インライン型では直接定義されたものだけ）
+        attr_specs = type_info.attrs if inline else chain(type_info.attrs, type_info.ext_attrs)
+        for attr_spec in attr_specs:
+            if attr_spec.required or include_optional:
+                paths.add(attr_spec.path_suffix)
+
+        # 子要素
+        child_depth = remaining_depth - 1
+        for elements, is_choice in type_info.containers:
+            if is_choice and elements:
+                elements = [elements[choice_index % len(elements)]]
+
+            for elem_spec in elements:
+                if elem_spec.min_occurs == 0 and not include_optional:
+                    continue
+
+                child_paths = ()
+                if elem_spec.name:
+                    child_type = elem_spec.type_name
+                    if elem_spec.inline_complex_type is not None:
+                        child_paths = self._inline_relative_paths(elem_spec.inline_complex_type,
+                                                                  child_depth, include_optional,
+                                                                  choice_index)
+                    elif (child_type and child_type not in _SAMPLE_TEXT_TYPES
+                          and (inline or child_type not in _ID_TEXT_TYPES)):
+                        child_paths = self._relative_paths(child_type, child_depth,
+                                                           include_optional, choice_index)
+                elif elem_spec.ref and not inline:
+                    ref_type = self._find_ref_type(elem_spec.ref)
+                    if ref_type:
+                        child_paths = self._relative_paths(
+                            self.schema_analyzer._remove_ns_prefix(ref_type), child_depth,
+                            include_optional, choice_index
+                        )
+                else:
+                    continue
+
+                suffix = elem_spec.path_suffix
+                paths.add(suffix)
+                paths.update([suffix + path for path in child_paths])
+
+        return frozenset(paths)
+
+    def _remove_redundant_snippets(self, variants: List[SnippetVariant]) -> List[SnippetVariant]:
+        """セット被覆で選ばれることのないスニペットを除く
+
+        カバー範囲が他のスニペットの部分集合で、深度もそれ以上のスニペットは、
+        どの反復でもスコアが相手以下になるので選択の必要がない。
+        カバー範囲が同じなら最も浅いもの（同じ深度なら先に生成したもの）を残す。
+
+        Args:
+            variants: 生成順のスニペット候補のリスト
+
+        Returns:
+            残したスニペット候補のリスト（生成順）
+        """
+        # カバー範囲ごとに最も浅いものを残す
+        by_mask: Dict[int, SnippetVariant] = {}
+        for variant in variants:
+            kept = by_mask.get(variant.mask)
+            if kept is None or variant.depth < kept.depth:
+                by_mask[variant.mask] = variant
+
+        # カバー項目数の多い順に見て、残したものに含まれるものを除く
+        # （部分集合の関係は推移的なので、残したものとだけ比べればよい）
+        dominant: List[SnippetVariant] = []
+        for variant in sorted(by_mask.values(), key=lambda v: popcount(v.mask), reverse=True):
+            mask = variant.mask
+            if not any(
+                mask & ~other.mask == 0 and other.depth <= variant.depth
+                for other in dominant
+            ):
+                dominant.append(variant)
+
+        kept_ids = {id(variant) for variant in dominant}
+        return [variant for variant in variants if id(variant) in kept_ids]
+
     def _generate_snippet_for_depth(self, elem_name: str, elem_type: str,
                                     target_depth: int, include_optional: bool = True,
                                     choice_index: int = 0) -> Optional[XMLSnippet]:
@@ -170,6 +457,8 @@ class XMLGenerator:
         Returns:
             XMLSnippet または None
         """
+        self._reset_sample_values()
+
         # 名前空間を設定
         nsmap = self.namespace_map if self.namespace_map else None
 
@@ -196,7 +485,29 @@ class XMLGenerator:
         self._build_element(root, root_path, elem_type, 1, target_depth, covered_paths,
                           include_optional=include_optional, choice_index=choice_index)
 
-        return XMLSnippet(root, covered_paths, target_depth)
+        return XMLSnippet(root, covered_paths, target_depth, self._paths_to_mask(covered_paths))
+
+    def _reset_sample_values(self):
+        """サンプル値用の乱数（シード固定）と値プールを初期状態に戻す
+
+        スニペットごとに呼び、同じバリエーションからは構築の順序やプロセスによらず
+        同じXMLを生成する。
+        """
+        self._rng = random.Random(0)
+        self._sample_value_pools = {
+            type_name: cycle(values) for type_name, values in self._sample_value_lists.items()
+        }
+        self._id_pool = self._sample_value_pools['ID']
+
+    def _paths_to_mask(self, paths: Set[str]) -> int:
+        """パス集合をカバレッジ項目のビット集合に変換（カバレッジ項目以外のパスは無視）"""
+        path_index = self.path_index
+        mask = 0
+        for path in paths:
+            bit = path_index.get(path)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
 
     def _build_element(self, parent_elem: etree._Element, parent_path: str,
                       type_name: str, current_depth: int, max_depth: int,
@@ -220,101 +531,109 @@ class XMLGenerator:
         # 名前空間プレフィックスを除去
         clean_type_name = self.schema_analyzer._remove_ns_prefix(type_name)
 
-        # キャッシュから型定義を取得
-        type_def = self.type_cache.get(clean_type_name)
-        if type_def is None:
+        # 型定義から取り出した宣言を取得
+        type_info = self._get_type_info(clean_type_name)
+        if type_info is None:
             return
 
         # 【属性を追加】
-        self._add_attributes(parent_elem, parent_path, type_def, covered_paths,
+        self._add_attributes(parent_elem, parent_path, type_info, covered_paths,
                            include_optional=include_optional)
 
         # 【子要素を追加】
         # sequence/choice/all内の要素を処理
-        for container in type_def.findall('.//xsd:sequence', self.ns) + \
-                       type_def.findall('.//xsd:choice', self.ns) + \
-                       type_def.findall('.//xsd:all', self.ns):
+        for elements, is_choice in type_info.containers:
 
             # choice の場合は1つだけ選択
-            elements = container.findall('./xsd:element', self.ns)
-            is_choice = 'choice' in container.tag
-
             if is_choice and elements:
                 # choiceの場合は指定されたインデックスの要素を選択
                 idx = choice_index % len(elements)  # 範囲外の場合は循環
                 elements = [elements[idx]]
 
-            for elem_def in elements:
-                elem_name = elem_def.get('name')
-                elem_ref = elem_def.get('ref')
-                elem_type = elem_def.get('type')
-                min_occurs = int(elem_def.get('minOccurs', '1'))
-                max_occurs = elem_def.get('maxOccurs', '1')
-
+            for elem_spec in elements:
                 # minOccurs=0の要素はオプショナル
                 # include_optional=Falseの場合はスキップ
-                if min_occurs == 0 and not include_optional:
+                if elem_spec.min_occurs == 0 and not include_optional:
                     continue
 
-                if elem_name:
-                    # 名前空間を考慮して子要素を作成
-                    if self.namespace_map and 'ns' in self.namespace_map:
-                        child_elem = etree.SubElement(
-                            parent_elem,
-                            f"{{{self.namespace_map['ns']}}}{elem_name}"
-                        )
-                    else:
-                        child_elem = etree.SubElement(parent_elem, elem_name)
-
-                    child_path = f"{parent_path}/{elem_name}"
+                if elem_spec.name:
+                    child_path = parent_path + elem_spec.path_suffix
                     covered_paths.add(child_path)
 
+                    clean_elem_type = elem_spec.type_name
+                    if (elem_spec.inline_complex_type is None and clean_elem_type
+                            and clean_elem_type not in _SAMPLE_TEXT_TYPES
+                            and clean_elem_type not in _ID_TEXT_TYPES):
+                        # 複合型の場合は再帰的に処理
+                        self._build_child_element(parent_elem, elem_spec.tag, child_path,
+                                                  clean_elem_type, current_depth + 1, max_depth,
+                                                  covered_paths, include_optional, choice_index)
+                        continue
+
+                    # 名前空間を考慮して子要素を作成（タグは宣言から作成済み）
+                    child_elem = etree.SubElement(parent_elem, elem_spec.tag)
+
                     # インライン型定義をチェック
-                    inline_complex_type = elem_def.find('./xsd:complexType', self.ns)
-                    if inline_complex_type is not None:
+                    if elem_spec.inline_complex_type is not None:
                         self._build_inline_type(child_elem, child_path,
-                                              inline_complex_type,
+                                              elem_spec.inline_complex_type,
                                               current_depth + 1, max_depth,
                                               covered_paths, include_optional, choice_index)
-                    elif elem_type:
-                        clean_elem_type = self.schema_analyzer._remove_ns_prefix(elem_type)
-
+                    elif clean_elem_type:
                         # 組み込み型の場合はサンプル値を設定
-                        if clean_elem_type in ['string', 'integer', 'date', 'dateTime',
-                                               'boolean', 'decimal', 'float', 'double']:
+                        if clean_elem_type in _SAMPLE_TEXT_TYPES:
                             child_elem.text = self._generate_sample_value(clean_elem_type)
-                        elif clean_elem_type in ['ID', 'NCName', 'token']:
-                            child_elem.text = f"ID{random.randint(1000, 9999)}"
                         else:
-                            # 複合型の場合は再帰的に処理
-                            self._build_element(child_elem, child_path, elem_type,
-                                              current_depth + 1, max_depth,
-                                              covered_paths, include_optional, choice_index)
+                            self._drawn_value_count += 1
+                            child_elem.text = next(self._id_pool)
 
-                elif elem_ref:
+                elif elem_spec.ref:
                     # ref要素の処理
-                    ref_name = self.schema_analyzer._remove_ns_prefix(elem_ref)
+                    child_path = parent_path + elem_spec.path_suffix
+                    covered_paths.add(child_path)
 
-                    if self.namespace_map and 'ns' in self.namespace_map:
-                        child_elem = etree.SubElement(
-                            parent_elem,
-                            f"{{{self.namespace_map['ns']}}}{ref_name}"
-                        )
+                    # ref要素の型を探す
+                    ref_type = self._find_ref_type(elem_spec.ref)
+                    if ref_type:
+                        self._build_child_element(parent_elem, elem_spec.tag, child_path,
+                                                  self.schema_analyzer._remove_ns_prefix(ref_type),
+                                                  current_depth + 1, max_depth,
+                                                  covered_paths, include_optional, choice_index)
                     else:
-                        child_elem = etree.SubElement(parent_elem, ref_name)
+                        etree.SubElement(parent_elem, elem_spec.tag)
 
-                    child_path = f"{parent_path}/{ref_name}"
-                    covered_paths.add(child_path)
+    def _build_child_element(self, parent_elem: etree._Element, tag: str, child_path: str,
+                             type_name: str, current_depth: int, max_depth: int,
+                             covered_paths: Set[str], include_optional: bool,
+                             choice_index: int):
+        """名前付きの複合型の子要素を作成し、型定義に基づいて中身を構築
 
-                    # ref要素の型を探す
-                    ref_elements = self.schema_root.findall(f'.//xsd:element[@name="{ref_name}"]', self.ns)
-                    for ref_elem in ref_elements:
-                        ref_type = ref_elem.get('type')
-                        if ref_type:
-                            self._build_element(child_elem, child_path, ref_type,
-                                              current_depth + 1, max_depth,
-                                              covered_paths, include_optional, choice_index)
-                            break
+        同じ条件（タグ, 型名, 残り深度, include_optional, choice_index）で構築した内容が
+        固定の部分木はテンプレートとして保持し、以降は構築せずにコピーして使う。
+        カバーするパスは _relative_paths から求める。
+        """
+        remaining_depth = max_depth - current_depth
+        key = (tag, type_name, remaining_depth, include_optional, choice_index)
+        template = self._subtree_cache.get(key)
+        if template is not None:
+            parent_elem.append(copy.deepcopy(template))
+            covered_paths.update([child_path + path for path in
+                                  self._relative_paths(type_name, remaining_depth,
+                                                       include_optional, choice_index)])
+            return
+
+        child_elem = etree.SubElement(parent_elem, tag)
+        drawn_value_count = self._drawn_value_count
+        self._build_element(child_elem, child_path, type_name, current_depth, max_depth,
+                            covered_paths, include_optional, choice_index)
+        if self._drawn_value_count == drawn_value_count:
+            # 乱数・値プールを使わなかった → 何度構築しても同じ内容
+            self._subtree_cache[key] = copy.deepcopy(child_elem)
+
+    def _find_ref_type(self, ref_name: str) -> Optional[str]:
+        """ref先の要素の型名を取得（type属性を持つ最初の同名要素宣言）"""
+        ref_elem = self.global_element_index.get(ref_name)
+        return ref_elem.get('type') if ref_elem is not None else None
 
     def _build_inline_type(self, parent_elem: etree._Element, parent_path: str,
                           type_elem: etree._Element, current_depth: int,
@@ -325,152 +644,197 @@ class XMLGenerator:
         if current_depth > max_depth:
             return
 
-        # 属性を追加
-        for attr_def in type_elem.findall('./xsd:attribute[@name]', self.ns):
-            attr_name = attr_def.get('name')
-            attr_type = attr_def.get('type', 'xsd:string')
-            attr_use = attr_def.get('use', 'optional')
-            attr_path = f"{parent_path}@{attr_name}"
+        type_info = self._get_inline_type_info(type_elem)
 
+        # 属性を追加
+        for attr_spec in type_info.attrs:
             # required属性または include_optional=True の場合に追加
-            if attr_use == 'required' or include_optional:
-                clean_attr_type = self.schema_analyzer._remove_ns_prefix(attr_type)
-                sample_value = self._generate_sample_value(clean_attr_type)
-                parent_elem.set(attr_name, sample_value)
-                covered_paths.add(attr_path)
+            if attr_spec.required or include_optional:
+                sample_value = self._generate_sample_value(attr_spec.type_name)
+                parent_elem.set(attr_spec.name, sample_value)
+                covered_paths.add(parent_path + attr_spec.path_suffix)
 
         # 子要素を追加
-        for container in type_elem.findall('.//xsd:sequence', self.ns) + \
-                       type_elem.findall('.//xsd:choice', self.ns) + \
-                       type_elem.findall('.//xsd:all', self.ns):
-
-            elements = container.findall('./xsd:element', self.ns)
-            is_choice = 'choice' in container.tag
+        for elements, is_choice in type_info.containers:
 
             if is_choice and elements:
                 idx = choice_index % len(elements)
                 elements = [elements[idx]]
 
-            for elem_def in elements:
-                elem_name = elem_def.get('name')
-                elem_type = elem_def.get('type')
-                min_occurs = int(elem_def.get('minOccurs', '1'))
-
+            for elem_spec in elements:
                 # minOccurs=0の要素はオプショナル
-                if min_occurs == 0 and not include_optional:
+                if elem_spec.min_occurs == 0 and not include_optional:
                     continue
 
-                if elem_name:
-                    if self.namespace_map and 'ns' in self.namespace_map:
-                        child_elem = etree.SubElement(
-                            parent_elem,
-                            f"{{{self.namespace_map['ns']}}}{elem_name}"
-                        )
-                    else:
-                        child_elem = etree.SubElement(parent_elem, elem_name)
-
-                    child_path = f"{parent_path}/{elem_name}"
+                if elem_spec.name:
+                    child_path = parent_path + elem_spec.path_suffix
                     covered_paths.add(child_path)
 
+                    clean_elem_type = elem_spec.type_name
+                    if (elem_spec.inline_complex_type is None and clean_elem_type
+                            and clean_elem_type not in _SAMPLE_TEXT_TYPES):
+                        self._build_child_element(parent_elem, elem_spec.tag, child_path,
+                                                  clean_elem_type, current_depth + 1, max_depth,
+                                                  covered_paths, include_optional, choice_index)
+                        continue
+
+                    child_elem = etree.SubElement(parent_elem, elem_spec.tag)
+
                     # ネストしたインライン型
-                    nested_complex = elem_def.find('./xsd:complexType', self.ns)
-                    if nested_complex is not None:
-                        self._build_inline_type(child_elem, child_path, nested_complex,
-                                              current_depth + 1, max_depth, covered_paths,
-                                              include_optional, choice_index)
-                    elif elem_type:
-                        clean_elem_type = self.schema_analyzer._remove_ns_prefix(elem_type)
-                        if clean_elem_type in ['string', 'integer', 'date', 'dateTime',
-                                               'boolean', 'decimal', 'float', 'double']:
-                            child_elem.text = self._generate_sample_value(clean_elem_type)
-                        else:
-                            self._build_element(child_elem, child_path, elem_type,
+                    if elem_spec.inline_complex_type is not None:
+                        self._build_inline_type(child_elem, child_path,
+                                              elem_spec.inline_complex_type,
                                               current_depth + 1, max_depth, covered_paths,
                                               include_optional, choice_index)
+                    elif clean_elem_type:
+                        child_elem.text = self._generate_sample_value(clean_elem_type)
 
     def _add_attributes(self, elem: etree._Element, elem_path: str,
-                       type_def: etree._Element, covered_paths: Set[str],
+                       type_info: TypeInfo, covered_paths: Set[str],
                        include_optional: bool = True):
-        """型定義に基づいて属性を追加"""
-
-        # 直接定義された属性
-        for attr_def in type_def.findall('./xsd:attribute[@name]', self.ns):
-            attr_name = attr_def.get('name')
-            attr_type = attr_def.get('type', 'xsd:string')
-            attr_use = attr_def.get('use', 'optional')
+        """型定義に基づいて属性を追加（直接定義された属性、extension内の属性の順）"""
 
+        for attr_spec in chain(type_info.attrs, type_info.ext_attrs):
             # required属性またはinclude_optional=Trueの場合に追加
-            if attr_use == 'required' or include_optional:
-                clean_attr_type = self.schema_analyzer._remove_ns_prefix(attr_type)
-
+            if attr_spec.required or include_optional:
                 # 列挙型の場合は列挙値から選択
-                enum_values = self._get_enum_values(clean_attr_type)
+                enum_values = self._get_enum_values(attr_spec.type_name)
                 if enum_values:
-                    sample_value = random.choice(enum_values)
+                    self._drawn_value_count += 1
+                    sample_value = self._rng.choice(enum_values)
                 else:
-                    sample_value = self._generate_sample_value(clean_attr_type)
+                    sample_value = self._generate_sample_value(attr_spec.type_name)
 
-                elem.set(attr_name, sample_value)
+                elem.set(attr_spec.name, sample_value)
 
-                attr_path = f"{elem_path}@{attr_name}"
-                covered_paths.add(attr_path)
+                covered_paths.add(elem_path + attr_spec.path_suffix)
 
-        # extension内の属性
-        for ext in type_def.findall('.//xsd:extension', self.ns):
-            for attr_def in ext.findall('./xsd:attribute[@name]', self.ns):
-                attr_name = attr_def.get('name')
-                attr_type = attr_def.get('type', 'xsd:string')
-                attr_use = attr_def.get('use', 'optional')
-
-                # required属性またはinclude_optional=Trueの場合に追加
-                if attr_use == 'required' or include_optional:
-                    clean_attr_type = self.schema_analyzer._remove_ns_prefix(attr_type)
-
-                    enum_values = self._get_enum_values(clean_attr_type)
-                    if enum_values:
-                        sample_value = random.choice(enum_values)
-                    else:
-                        sample_value = self._generate_sample_value(clean_attr_type)
-
-                    elem.set(attr_name, sample_value)
-
-                    attr_path = f"{elem_path}@{attr_name}"
-                    covered_paths.add(attr_path)
-
-    def _get_enum_values(self, type_name: str) -> List[str]:
+    def _get_enum_values(self, type_name: str) -> Tuple[str, ...]:
         """simpleTypeの列挙値を取得"""
-        type_def = self.type_cache.get(type_name)
-        if type_def is None:
-            return []
-
-        # simpleType内のenumerationを探す
-        enums = type_def.findall('.//xsd:enumeration', self.ns)
-        return [e.get('value') for e in enums if e.get('value')]
+        type_info = self._get_type_info(type_name)
+        if type_info is None:
+            return ()
+        return type_info.enum_values
+
+    def _get_type_info(self, type_name: str) -> Optional[TypeInfo]:
+        """名前付きの型定義から取り出した宣言を取得（型ごとに1回だけ取り出す）"""
+        type_info = self.type_index.get(type_name)
+        if type_info is None:
+            type_def = self.type_cache.get(type_name)
+            if type_def is None:
+                return None
+            type_info = self._make_type_info(type_def)
+            self.type_index[type_name] = type_info
+        return type_info
+
+    def _get_inline_type_info(self, type_elem: etree._Element) -> TypeInfo:
+        """インラインのcomplexTypeから取り出した宣言を取得"""
+        type_info = self._inline_type_index.get(type_elem)
+        if type_info is None:
+            type_info = self._make_type_info(type_elem)
+            self._inline_type_index[type_elem] = type_info
+        return type_info
+
+    def _make_type_info(self, type_def: etree._Element) -> TypeInfo:
+        """型定義（名前付き・インライン）から属性・子要素・列挙値の宣言を取り出す"""
+        ns = self.ns
+
+        attrs = [self._make_attr_spec(attr_def)
+                 for attr_def in type_def.findall('./xsd:attribute[@name]', ns)]
+
+        # extension内の属性（complexContent/simpleContent 直下の extension のみ）
+        xsd = ns['xsd']
+        ext_attrs = [self._make_attr_spec(attr_def)
+                     for content in type_def.iterchildren(f'{{{xsd}}}complexContent',
+                                                          f'{{{xsd}}}simpleContent')
+                     for ext in content.iterchildren(f'{{{xsd}}}extension')
+                     for attr_def in ext.findall('./xsd:attribute[@name]', ns)]
+
+        # sequence/choice/all ごとの子要素宣言
+        containers = []
+        for container in self._collect_containers(type_def):
+            elements = [self._make_elem_spec(elem_def)
+                        for elem_def in container.findall('./xsd:element', ns)]
+            containers.append((elements, container.tag == f'{{{xsd}}}choice'))
+
+        # simpleType内のenumeration
+        enum_values = tuple(e.get('value') for e in type_def.findall('.//xsd:enumeration', ns)
+                            if e.get('value'))
+
+        return TypeInfo(attrs, ext_attrs, containers, enum_values)
+
+    def _collect_containers(self, type_def: etree._Element) -> List[etree._Element]:
+        """型定義の内容モデルを構成する sequence/choice/all を集める
+
+        型定義直下と complexContent の extension/restriction 直下からたどり、
+        入れ子になった sequence/choice/all も含める。子要素のインライン型の中には入らない。
+        順序は sequence → choice → all（それぞれ文書順）。
+        """
+        xsd = self.ns['xsd']
+        group_tags = (f'{{{xsd}}}sequence', f'{{{xsd}}}choice', f'{{{xsd}}}all')
+
+        parents = [type_def]
+        for content in type_def.iterchildren(f'{{{xsd}}}complexContent'):
+            parents.extend(content.iterchildren(f'{{{xsd}}}extension', f'{{{xsd}}}restriction'))
+
+        # 文書順（行きがけ順）に集める
+        containers = []
+        pending = [group for parent in reversed(parents)
+                   for group in reversed(list(parent.iterchildren(*group_tags)))]
+        while pending:
+            container = pending.pop()
+            containers.append(container)
+            pending.extend(reversed(list(container.iterchildren(*group_tags))))
+
+        containers.sort(key=lambda container: group_tags.index(container.tag))
+        return containers
+
+    def _make_attr_spec(self, attr_def: etree._Element) -> AttrSpec:
+        """属性宣言から必要な値を取り出す"""
+        attr_name = attr_def.get('name')
+        return AttrSpec(
+            name=attr_name,
+            type_name=self.schema_analyzer._remove_ns_prefix(attr_def.get('type', 'xsd:string')),
+            required=attr_def.get('use', 'optional') == 'required',
+            path_suffix='@' + attr_name
+        )
+
+    def _make_elem_spec(self, elem_def: etree._Element) -> ElemSpec:
+        """子要素宣言から必要な値を取り出す"""
+        remove_ns_prefix = self.schema_analyzer._remove_ns_prefix
+        elem_name = elem_def.get('name')
+        elem_type = elem_def.get('type')
+        elem_ref = elem_def.get('ref')
+        ref_name = remove_ns_prefix(elem_ref) if elem_ref else None
+
+        # 作成する要素名（name がなければ ref先の要素名）
+        local_name = elem_name or ref_name
+        tag = None
+        path_suffix = None
+        if local_name:
+            if self.namespace_map and 'ns' in self.namespace_map:
+                tag = f"{{{self.namespace_map['ns']}}}{local_name}"
+            else:
+                tag = local_name
+            path_suffix = '/' + local_name
+
+        return ElemSpec(
+            name=elem_name,
+            ref=ref_name,
+            type_name=remove_ns_prefix(elem_type) if elem_type else None,
+            min_occurs=int(elem_def.get('minOccurs', '1')),
+            inline_complex_type=elem_def.find('./xsd:complexType', self.ns),
+            tag=tag,
+            path_suffix=path_suffix
+        )
 
     def _generate_sample_value(self, type_name: str) -> str:
         """型に応じたサンプル値を生成"""
-        type_samples = {
-            'string': 'SampleText',
-            'integer': '42',
-            'int': '42',
-            'long': '1234567890',
-            'short': '100',
-            'byte': '10',
-            'decimal': '123.45',
-            'float': '123.45',
-            'double': '123.456789',
-            'boolean': 'true',
-            'date': '2025-01-15',
-            'dateTime': '2025-01-15T10:30:00',
-            'time': '10:30:00',
-            'anyURI': 'http://example.com',
-            'base64Binary': 'QmFzZTY0RGF0YQ==',
-            'hexBinary': '48656C6C6F',
-            'ID': f'ID{random.randint(1000, 9999)}',
-            'NCName': f'NCName{random.randint(100, 999)}',
-            'token': f'Token{random.randint(100, 999)}',
-        }
-        return type_samples.get(type_name, 'DefaultValue')
+        pool = self._sample_value_pools.get(type_name)
+        if pool is not None:
+            self._drawn_value_count += 1
+            return next(pool)
+        return _SAMPLE_VALUES.get(type_name, 'DefaultValue')
 
 
 class SetCoverOptimizer:
@@ -481,11 +845,18 @@ class SetCoverOptimizer:
         Args:
             all_items: カバレッジ項目の全集合 U
             snippets: XMLスニペット候補のリスト
+                      （mask は all_items から作った XMLGenerator.path_index のビット集合）
         """
         self.all_items = all_items
         self.snippets = snippets
         self.selected_snippets: List[XMLSnippet] = []
 
+        # スニペットごとの深度ペナルティ（反復のたびに計算し直さない）
+        # 浅い深度で多くカバーできるものを優先する
+        self.depth_penalties: List[float] = [
+            1.0 / (1.0 + snippet.depth * 0.1) for snippet in snippets
+        ]
+
     def solve_greedy(self, target_coverage: float = 0.95,
                      max_files: int = 50) -> List[XMLSnippet]:
         """貪欲法でセット被覆問題を解く
@@ -497,7 +868,9 @@ class SetCoverOptimizer:
         Returns:
             選択されたXMLSnippetのリスト
         """
-        uncovered = self.all_items.copy()
+        # 未カバー項目をビット集合で持つ（全項目のビットが立った状態から開始）
+        total_items = len(self.all_items)
+        uncovered = (1 << total_items) - 1
         selected = []
 
         print(f"セット被覆最適化開始:")
@@ -506,6 +879,19 @@ class SetCoverOptimizer:
         print(f"  目標カバレッジ: {target_coverage * 100:.1f}%")
         print()
 
+        # 遅延評価の貪欲法:
+        # 新規カバー数は反復が進むほど減る一方なので、ヒープに積んだスコアは
+        # 現在のスコアの上界になる。先頭だけ現在のスコアで評価し直し、
+        # 評価し直しても先頭に残ったものを選ぶ（全候補を毎回評価しない）
+        # ヒープ要素: (-スコア, スニペット番号, 新規カバー数, 評価した反復)
+        # 同スコアならスニペット番号の小さいものが先（全候補を順に見る場合と同じ選択になる）
+        heap = []
+        for index, (snippet, depth_penalty) in enumerate(zip(self.snippets, self.depth_penalties)):
+            coverage_count = popcount(snippet.mask)
+            if coverage_count > 0:
+                heap.append((-coverage_count * depth_penalty, index, coverage_count, 1))
+        heapq.heapify(heap)
+
         iteration = 0
         while uncovered and len(selected) < max_files:
             iteration += 1
@@ -513,23 +899,24 @@ class SetCoverOptimizer:
             # 最も多くの未カバー項目をカバーするスニペットを選択
             best_snippet = None
             best_coverage_count = 0
-            best_score = 0
-
-            for snippet in self.snippets:
-                # このスニペットが新たにカバーする項目数
-                new_coverage = snippet.covered_paths & uncovered
-                coverage_count = len(new_coverage)
 
+            while heap:
+                _, index, coverage_count, evaluated_at = heap[0]
+                if evaluated_at == iteration:
+                    # この反復で評価済みのまま先頭にある → 最良
+                    heapq.heappop(heap)
+                    best_snippet = self.snippets[index]
+                    best_coverage_count = coverage_count
+                    break
+
+                # このスニペットが新たにカバーする項目数を評価し直す
+                coverage_count = popcount(self.snippets[index].mask & uncovered)
                 if coverage_count > 0:
                     # スコア計算（深度ペナルティを考慮）
-                    # 浅い深度で多くカバーできるものを優先
-                    depth_penalty = 1.0 / (1.0 + snippet.depth * 0.1)
-                    score = coverage_count * depth_penalty
-
-                    if score > best_score:
-                        best_score = score
-                        best_coverage_count = coverage_count
-                        best_snippet = snippet
+                    score = coverage_count * self.depth_penalties[index]
+                    heapq.heapreplace(heap, (-score, index, coverage_count, iteration))
+                else:
+                    heapq.heappop(heap)
 
             if best_snippet is None:
                 # これ以上カバーできない
@@ -537,15 +924,15 @@ class SetCoverOptimizer:
 
             # 選択
             selected.append(best_snippet)
-            newly_covered = best_snippet.covered_paths & uncovered
-            uncovered -= newly_covered
+            uncovered &= ~best_snippet.mask
+            covered_count = total_items - popcount(uncovered)
 
-            current_coverage = (len(self.all_items) - len(uncovered)) / len(self.all_items)
+            current_coverage = covered_count / total_items
 
             print(f"  反復 {iteration}: スニペット選択（深度={best_snippet.depth}）")
             print(f"    新規カバー: {best_coverage_count}項目")
             print(f"    累積カバレッジ: {current_coverage * 100:.2f}% "
-                  f"({len(self.all_items) - len(uncovered)}/{len(self.all_items)})")
+                  f"({covered_count}/{total_items})")
 
             # 目標カバレッジに到達したら終了
             if current_coverage >= target_coverage:
@@ -554,14 +941,35 @@ class SetCoverOptimizer:
 
         print(f"\n最適化完了:")
         print(f"  選択されたファイル数: {len(selected)}")
-        print(f"  最終カバレッジ: {((len(self.all_items) - len(uncovered)) / len(self.all_items) * 100):.2f}%")
-        print(f"  未カバー項目数: {len(uncovered)}")
+        uncovered_count = popcount(uncovered)
+        print(f"  最終カバレッジ: {((total_items - uncovered_count) / total_items * 100):.2f}%")
+        print(f"  未カバー項目数: {uncovered_count}")
         print()
 
         self.selected_snippets = selected
         return selected
 
 
+# ワーカープロセスごとのジェネレータ（XSDの解析はプロセスごとに1回だけ行う）
+_worker_generator: Optional[XMLGenerator] = None
+
+
+def _init_worker(xsd_path: str, max_depth: int, namespace_map: Dict[str, str]):
+    """ワーカープロセスの起動時にジェネレータを作成"""
+    global _worker_generator
+    _worker_generator = XMLGenerator(xsd_path, max_depth, namespace_map)
+
+
+def _build_snippet_in_worker(variant: SnippetVariant) -> Tuple[bytes, Set[str]]:
+    """ワーカープロセスのジェネレータでスニペットを構築し、(XMLのバイト列, カバーするパス) を返す"""
+    snippet = _worker_generator._generate_snippet_for_depth(
+        variant.elem_name, variant.elem_type, variant.depth,
+        include_optional=variant.include_optional,
+        choice_index=variant.choice_index
+    )
+    return etree.tostring(snippet.root_element), snippet.covered_paths
+
+
 def save_snippets_to_files(snippets: List[XMLSnippet], output_dir: str, prefix: str = "generated"):
     """選択されたスニペットをXMLファイルとして保存
 
@@ -576,8 +984,8 @@ def save_snippets_to_files(snippets: List[XMLSnippet], output_dir: str, prefix:
         filename = f"{prefix}_{i:03d}_depth{snippet.depth}.xml"
         filepath = os.path.join(output_dir, filename)
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(snippet.to_string())
+        with open(filepath, 'wb') as f:
+            f.write(snippet.to_bytes())
 
         print(f"  {filename} (深度={snippet.depth}, カバー={len(snippet.covered_paths)}項目)")
 
@@ -615,6 +1023,8 @@ def main():
                        help='生成する候補スニペット数（デフォルト: 100）')
     parser.add_argument('--prefix', type=str, default='generated',
                        help='生成ファイルのプレフィックス（デフォルト: generated）')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='XML構築の並列プロセス数（デフォルト: 1）。0でCPU数')
     parser.add_argument('--namespace', type=str, default=None,
                        help='名前空間URI（自動検出されない場合に指定）')
 
@@ -652,7 +1062,8 @@ def main():
     print("ステップ2: XMLスニペット候補を生成中...")
     snippets = generator.generate_snippets(
         max_snippets=args.max_snippets,
-        max_gen_depth=args.max_gen_depth
+        max_gen_depth=args.max_gen_depth,
+        workers=args.workers if args.workers > 0 else (os.cpu_count() or 1)
     )
     print(f"  生成された候補数: {len(snippets)}")
 
@@ -17,13 +17,68 @@
 import sys
 import os
 import argparse
-from lxml import etree
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Optional, Tuple
 from optional_extractor import OptionalElementExtractor
-from pairwise_generator import PairwiseCoverageGenerator
+from pairwise_generator import PairwiseCoverageGenerator, TestPattern
 from pairwise_generator_scalable import ScalablePairwiseCoverageGenerator
 from pairwise_xml_builder import PairwiseXMLBuilder
 
 
+# ワーカープロセスごとのビルダー（XSDの解析はプロセスごとに1回だけ行う）
+_worker_builder: Optional[PairwiseXMLBuilder] = None
+
+
+def _init_worker(xsd_path: str, max_depth: int, namespace_map: Dict[str, str]):
+    """ワーカープロセスの起動時にビルダーを作成"""
+    global _worker_builder
+    _worker_builder = PairwiseXMLBuilder(
+        xsd_path=xsd_path,
+        max_depth=max_depth,
+        namespace_map=namespace_map
+    )
+
+
+def _write_pattern_xml(
+    builder: PairwiseXMLBuilder,
+    pattern: TestPattern,
+    output_dir: str
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    1つのパターンからXMLを構築してファイルに保存
+
+    Returns:
+        (保存したファイルのパス, 失敗した場合の警告メッセージ)
+    """
+    try:
+        # XMLをUTF-8のバイト列として構築
+        xml_bytes = builder.build_xml_bytes(pattern)
+        if xml_bytes is None:
+            return None, f"パターン{pattern.pattern_id}のルート要素を作成できませんでした"
+
+        # ファイル名を生成
+        filename = f"pairwise_test_{pattern.pattern_id:03d}.xml"
+        filepath = os.path.join(output_dir, filename)
+
+        # ファイルに保存（エンコード済みなのでそのまま書き込む）
+        with open(filepath, 'wb') as f:
+            f.write(xml_bytes)
+
+        return filepath, None
+
+    except Exception as e:
+        return None, f"パターン{pattern.pattern_id}のXML生成に失敗: {e}"
+
+
+def _write_pattern_xml_in_worker(
+    pattern: TestPattern,
+    output_dir: str
+) -> Tuple[Optional[str], Optional[str]]:
+    """ワーカープロセスのビルダーでパターンのXMLを保存"""
+    return _write_pattern_xml(_worker_builder, pattern, output_dir)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='ペアワイズXML生成ツール - 組合せテストに基づくテストデータ生成'
@@ -60,12 +115,26 @@ def main():
         default=42,
         help='乱数シード（デフォルト: 42）'
     )
+    parser.add_argument(
+        '--algorithm',
+        choices=['greedy', 'ipog', 'aetg'],
+        default='greedy',
+        help='カバーリング配列の生成アルゴリズム（デフォルト: greedy）。'
+             'aetgはスケーラブル版で実行する。'
+             '大規模スキーマでは aetg 以外の指定はスケーラブル版のgreedyになる'
+    )
     parser.add_argument(
         '--max-parameters',
         type=int,
         default=300,
         help='大規模スキーマ時のオプション項目上限数（デフォルト: 300）'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='XML構築の並列プロセス数（デフォルト: 1）。0でCPU数'
+    )
 
     args = parser.parse_args()
 
@@ -87,6 +156,7 @@ def main():
     print(f"出力ディレクトリ: {args.output}")
     print(f"最大深度: {args.max_depth}")
     print(f"最大パターン数: {args.max_patterns}")
+    print(f"アルゴリズム: {args.algorithm}")
     print(f"オプション項目上限: {args.max_parameters}")
     print()
 
@@ -118,12 +188,15 @@ def main():
     # 大規模スキーマの場合、スケーラブル版を使用
     LARGE_SCHEMA_THRESHOLD = 500
 
-    if len(optional_paths) > LARGE_SCHEMA_THRESHOLD:
-        print(f"  大規模スキーマ検出（{len(optional_paths)}個のオプション項目）")
+    is_large_schema = len(optional_paths) > LARGE_SCHEMA_THRESHOLD
+
+    if is_large_schema or args.algorithm == 'aetg':
+        if is_large_schema:
+            print(f"  大規模スキーマ検出（{len(optional_paths)}個のオプション項目）")
         print(f"  スケーラブルなアルゴリズムを使用します")
 
         generator = ScalablePairwiseCoverageGenerator(
-            algorithm="greedy",
+            algorithm="aetg" if args.algorithm == 'aetg' else "greedy",
             random_seed=args.random_seed
         )
 
@@ -132,11 +205,11 @@ def main():
             strength=2,
             max_patterns=args.max_patterns,
             choice_groups=choice_groups,
-            max_parameters=args.max_parameters
+            max_parameters=args.max_parameters if is_large_schema else None
         )
     else:
         generator = PairwiseCoverageGenerator(
-            algorithm="greedy",
+            algorithm=args.algorithm,
             random_seed=args.random_seed
         )
 
@@ -153,43 +226,56 @@ def main():
 
     # Step 3: 各パターンからXMLを構築
     print("Step 3: パターンからXMLを構築中...")
-    builder = PairwiseXMLBuilder(
-        xsd_path=args.xsd_file,
-        max_depth=args.max_depth,
-        namespace_map=namespace_map
-    )
+    patterns = covering_array.patterns
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    workers = min(workers, len(patterns))
+
+    if workers > 1:
+        # パターンは互いに独立なので、ワーカープロセスで並列に構築・保存する
+        # （map() の結果は入力順に返る）
+        print(f"  並列プロセス数: {workers}")
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(args.xsd_file, args.max_depth, namespace_map)
+        )
+        chunksize = max(1, len(patterns) // (workers * 4))
+        results = executor.map(
+            _write_pattern_xml_in_worker,
+            patterns,
+            repeat(args.output),
+            chunksize=chunksize
+        )
+    else:
+        executor = None
+        builder = PairwiseXMLBuilder(
+            xsd_path=args.xsd_file,
+            max_depth=args.max_depth,
+            namespace_map=namespace_map
+        )
+        results = (
+            _write_pattern_xml(builder, pattern, args.output)
+            for pattern in patterns
+        )
 
     generated_files = []
 
-    for pattern in covering_array.patterns:
-        try:
-            xml_elem = builder.build_xml(pattern)
-
-            # XMLを文字列化
-            xml_str = etree.tostring(
-                xml_elem,
-                pretty_print=True,
-                xml_declaration=True,
-                encoding='utf-8'
-            ).decode('utf-8')
-
-            # ファイル名を生成
-            filename = f"pairwise_test_{pattern.pattern_id:03d}.xml"
-            filepath = os.path.join(args.output, filename)
-
-            # ファイルに保存
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(xml_str)
+    try:
+        for pattern, (filepath, warning) in zip(patterns, results):
+            if warning is not None:
+                print(f"  警告: {warning}")
+                continue
 
             generated_files.append(filepath)
 
             # 進捗表示
-            if (pattern.pattern_id + 1) % 10 == 0 or pattern.pattern_id == len(covering_array.patterns) - 1:
-                print(f"  {pattern.pattern_id + 1}/{len(covering_array.patterns)} ファイル生成完了")
-
-        except Exception as e:
-            print(f"  警告: パターン{pattern.pattern_id}のXML生成に失敗: {e}")
-            continue
+            if (pattern.pattern_id + 1) % 10 == 0 or pattern.pattern_id == len(patterns) - 1:
+                print(f"  {pattern.pattern_id + 1}/{len(patterns)} ファイル生成完了")
+    finally:
+        # 途中で例外（BrokenProcessPool, KeyboardInterrupt など）が起きても
+        # ワーカープロセスを残さない
+        if executor is not None:
+            executor.shutdown()
 
     print()
 
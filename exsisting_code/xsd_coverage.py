@@ -52,6 +52,7 @@ XSD Schema Coverage Analyzer
 import sys
 from lxml import etree
 from collections import defaultdict
+from dataclasses import dataclass
 from typing import Set, Dict, List, Tuple
 import glob
 
@@ -445,6 +446,20 @@ class XMLCoverageAnalyzer:
         return self.used_element_paths, self.used_attribute_paths
 
 
+@dataclass
+class CoverageReport:
+    """カバレッジ計測結果の要約
+
+    Attributes:
+        coverage: 総合カバレッジ率（%）
+        undefined_count: XSDで未定義の要素・属性パス数（外部スキーマ分を含む）
+        truly_undefined: XSDにも外部スキーマにも定義されていない要素・属性パス数
+    """
+    coverage: float
+    undefined_count: int
+    truly_undefined: int
+
+
 class CoverageReporter:
     """カバレッジレポートを生成"""
     
@@ -458,6 +473,24 @@ class CoverageReporter:
         self.used_elements = used_elements
         self.used_attributes = used_attributes
     
+    def summarize(self) -> CoverageReport:
+        """レポート文字列を作らずに、カバレッジの要約だけを計算"""
+        total_defined = len(self.defined_elements) + len(self.defined_attributes)
+        total_covered = len(self.used_elements & self.defined_elements) + \
+            len(self.used_attributes & self.defined_attributes)
+        total_coverage = (total_covered / total_defined * 100) if total_defined > 0 else 0
+
+        undefined = (self.used_elements - self.defined_elements) | \
+            (self.used_attributes - self.defined_attributes)
+        # XML Digital Signature (ds:) などの外部スキーマのパスは除外
+        truly_undefined = {p for p in undefined if '/Signature/' not in p}
+
+        return CoverageReport(
+            coverage=total_coverage,
+            undefined_count=len(undefined),
+            truly_undefined=len(truly_undefined)
+        )
+
     def generate_report(self) -> str:
         """カバレッジレポートを生成"""
         
@@ -676,6 +709,34 @@ class CoverageReporter:
         return (covered / len(defined)) * 100
 
 
+class CoverageChecker:
+    """XSDを一度だけ解析し、XMLファイルごとのカバレッジを繰り返し計測する
+
+    複数のXMLファイルを個別に計測する場合に、ファイルごとに
+    XSDの解析をやり直さないためのライブラリ用インターフェース。
+    """
+
+    def __init__(self, xsd_path: str, max_depth: int = 15):
+        self.schema_analyzer = SchemaAnalyzer(xsd_path)
+        self.schema_analyzer.analyze(max_recursion_depth=max_depth)
+        self.defined_elements, self.defined_attributes = \
+            self.schema_analyzer.get_defined_paths()
+
+    def check(self, xml_path: str) -> CoverageReport:
+        """1つのXMLファイルのカバレッジを計測して要約を返す"""
+        xml_analyzer = XMLCoverageAnalyzer([xml_path])
+        xml_analyzer.analyze()
+        used_elements, used_attributes = xml_analyzer.get_used_paths()
+
+        reporter = CoverageReporter(
+            self.defined_elements,
+            self.defined_attributes,
+            used_elements,
+            used_attributes
+        )
+        return reporter.summarize()
+
+
 def main():
     """メイン処理"""
     